@@ -5,7 +5,7 @@ from django.utils.html import format_html
 from .models import (
     User, ChurchProject, Video, InspirationQuote, 
     PrayerRequest, Testimony, UpcomingEvent, 
-    Course, Module, CourseVideo, Comment, Devotion, CourseApplication, Stream, PrayerRoom
+    Course, Module, CourseVideo, Comment, Devotion, DevotionDelivery, CourseApplication, Stream, PrayerRoom
 )
 
 @admin.register(User)
@@ -134,9 +134,20 @@ class CommentAdmin(admin.ModelAdmin):
         return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
     text_preview.short_description = 'Comment'
 
+class DevotionDeliveryInline(admin.TabularInline):
+    model = DevotionDelivery
+    extra = 0
+    fields = ('timezone', 'scheduled_for', 'created_at')
+    readonly_fields = ('timezone', 'scheduled_for', 'created_at')
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Devotion)
 class DevotionAdmin(admin.ModelAdmin):
     list_display = ('title', 'content_type', 'devotion_date', 'created_at')
+    inlines = [DevotionDeliveryInline]
     list_filter = ('content_type', 'devotion_date', 'created_at')
     search_fields = ('title', 'description', 'text_content')
     date_hierarchy = 'devotion_date'
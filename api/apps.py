@@ -4,3 +4,20 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from .caching import connect_signals
+        from .media_cleanup import connect_file_cleanup
+        from .models import (
+            ChurchProject, Comment, Course, CourseApplication, CourseVideo, Devotion, InspirationQuote, Module,
+            PrayerRequest, PrayerRoom, Stream, Testimony, UpcomingEvent, User, Video,
+        )
+
+        # Every model named in a ViewSet's cache_models (api.views, api.streaming, api.prayer_room)
+        connect_signals([
+            Video, InspirationQuote, Devotion, UpcomingEvent, Course, Module, CourseVideo,
+            User, ChurchProject, PrayerRequest, Testimony, Comment, CourseApplication, Stream, PrayerRoom,
+        ])
+
+        # Models with stored files, removed with the row or when replaced
+        connect_file_cleanup([ChurchProject, Testimony, UpcomingEvent, Course, Module])
@@ -0,0 +1,277 @@
+"""
+Response caching and conditional GET for the API's read endpoints.
+
+Each model a ViewSet's responses are built from (its ``cache_models``) has a
+version counter and a last-modified time in the shared cache, updated by the
+model's ``post_save`` and ``post_delete`` signals. Host, path, query string,
+renderer, authentication class and those versions together identify a
+response, so a write changes the identity of exactly the responses that
+could include it, and nothing else.
+
+``ConditionalGetMixin`` turns that identity into an ``ETag`` and the versions'
+times into ``Last-Modified``, and answers a matching ``If-None-Match`` or
+``If-Modified-Since`` with a 304 before the handler runs, so a revalidation
+never reaches the queryset or the serializer.
+
+``CachedResponseMixin`` adds a stored copy of the rendered response under the
+same identity, for JSON responses to requests without a session. Unreachable
+entries simply age out after ``TIMEOUT``. Staff can skip it for one request
+with ``X-Cache-Bypass: 1``, which also refreshes the stored copy. Responses
+carry ``X-Cache: HIT|MISS|BYPASS``.
+"""
+import copy
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.authentication import SessionAuthentication
+
+from server import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESPONSE_CACHE_CONFIG = {
+    'ENABLED': True,
+    'TIMEOUT': 300,  # seconds a stored response is kept
+}
+
+BYPASS_HEADER = 'X-Cache-Bypass'
+
+requests_counter = metrics.counter(
+    'api_response_cache_requests_total', 'Cacheable API reads, by view and result (hit, miss or bypass)')
+not_modified_counter = metrics.counter(
+    'api_not_modified_total', 'Conditional API reads answered with 304 Not Modified, by view')
+singleton_loads_counter = metrics.counter(
+    'api_singleton_loads_total', 'Database loads of a process-cached singleton row, by model')
+
+
+def get_response_cache_config():
+    return {**DEFAULT_RESPONSE_CACHE_CONFIG, **getattr(settings, 'API_RESPONSE_CACHE', {})}
+
+
+def _version_key(model):
+    return f'api:version:{model._meta.label_lower}'
+
+
+def _modified_key(model):
+    return f'api:modified:{model._meta.label_lower}'
+
+
+def _seed(models):
+    # A counter can vanish (cache cleared, or culled by the file cache), so a
+    # new one starts from the clock rather than 0 and never repeats a version
+    # some client still holds an ETag for. Nothing says when the model last
+    # changed, so it counts as changed now.
+    now = time.time()
+    for model in models:
+        cache.add(_version_key(model), time.time_ns() // 1000, timeout=None)
+        cache.add(_modified_key(model), now, timeout=None)
+
+
+def get_model_state(models):
+    """
+    Current versions and last change of ``models``, in one cache round trip
+    when the counters exist.
+
+    Returns:
+        ``({label: version}, last_modified)``, where ``last_modified`` is the
+        latest change to any of them as a Unix timestamp, or None for no models.
+    """
+    keys = {}
+    for model in models:
+        keys[_version_key(model)] = keys[_modified_key(model)] = model
+    stored = cache.get_many(keys)
+    missing = {model for key, model in keys.items() if key not in stored}
+    if missing:
+        _seed(missing)
+        stored.update(cache.get_many([key for key, model in keys.items() if model in missing]))
+
+    versions = {model._meta.label_lower: stored.get(_version_key(model), 0) for model in models}
+    modified = [stored.get(_modified_key(model), 0) for model in models]
+    return versions, max(modified, default=None)
+
+
+def bump_version(model):
+    key = _version_key(model)
+    # add() is a no-op when the key exists; incr() is atomic on Redis and
+    # close enough on the file cache, where a lost bump only costs a stale
+    # entry until a later write or TIMEOUT
+    cache.add(key, time.time_ns() // 1000, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # Evicted between add() and incr()
+        cache.set(key, time.time_ns() // 1000, timeout=None)
+    cache.set(_modified_key(model), time.time(), timeout=None)
+
+
+def _bump_on_change(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return  # Logins touch User but change nothing an endpoint returns
+    bump_version(sender)
+
+
+def connect_signals(models):
+    for model in models:
+        post_save.connect(_bump_on_change, sender=model, dispatch_uid=f'api-cache-{model._meta.label_lower}')
+        post_delete.connect(_bump_on_change, sender=model, dispatch_uid=f'api-cache-{model._meta.label_lower}')
+
+
+class CachedSingleton:
+    """
+    A single-row model (``Stream``, ``PrayerRoom``) kept in process memory.
+
+    ``get()`` costs one cache read for the model's version counter, which the
+    model's save and delete signals bump in every worker's view, and reloads
+    from the database only when the version has moved since the last load.
+    The version is read before loading, so a write racing a load leaves the
+    copy marked stale rather than current.
+
+    Args:
+        model: The model; it must be registered with ``connect_signals``.
+        load: Callable returning the row from the database, creating it if
+            needed.
+    """
+
+    def __init__(self, model, load):
+        self.model = model
+        self.load = load
+        self._cached = None  # (version, instance), replaced as a whole
+
+    def get(self):
+        versions, _last_modified = get_model_state([self.model])
+        version = versions[self.model._meta.label_lower]
+        cached = self._cached
+        if cached is None or cached[0] != version:
+            singleton_loads_counter.inc(model=self.model._meta.label_lower)
+            cached = self._cached = (version, self.load())
+        # Callers change and save what they get; keep the shared copy pristine
+        return copy.copy(cached[1])
+
+    def clear(self):
+        self._cached = None
+
+
+class ConditionalGetMixin:
+    """
+    ``ETag`` and ``Last-Modified`` on GET and HEAD, with 304 answers decided
+    from the version counters alone.
+
+    ViewSets set ``cache_models`` to every model their responses are built
+    from, and override ``cache_key_extra`` when a response also depends on
+    something outside the request, such as today's date.
+    """
+    cache_models = ()
+
+    def cache_key_extra(self):
+        return ''
+
+    def _identity(self, request):
+        """The parts that identify a response, shared by every user, and its last change"""
+        versions, last_modified = get_model_state(self.cache_models)
+        authenticator = request.successful_authenticator
+        parts = [
+            request.get_host(),
+            request.path,
+            '&'.join(sorted(request.GET.urlencode().split('&'))),
+            request.accepted_renderer.format,
+            type(authenticator).__name__ if authenticator else 'anonymous',
+            repr(sorted(versions.items())),
+            self.cache_key_extra(),
+        ]
+        return parts, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._etag = self._last_modified = self._identity_parts = self._precondition_response = None
+        if request.method not in ('GET', 'HEAD') or not self.cache_models:
+            return
+
+        self._identity_parts, last_modified = self._identity(request)
+        # Serializers may look at the user (Comment.user_has_replied), so the
+        # tag is per user even where the stored response is shared
+        user_part = str(request.user.pk) if request.user.is_authenticated else ''
+        digest = hashlib.sha256('|'.join([*self._identity_parts, user_part]).encode()).hexdigest()
+        self._etag = f'"{digest[:32]}"'
+        self._last_modified = int(last_modified) if last_modified else None
+
+        response = get_conditional_response(request._request, etag=self._etag, last_modified=self._last_modified)
+        if response is not None:
+            if response.status_code == 304:
+                not_modified_counter.inc(view=type(self).__name__)
+            self._precondition_response = response
+            # dispatch() looks the handler up after initial(), so swapping it
+            # here skips the queryset and serializer entirely
+            setattr(self, request.method.lower(), lambda *args, **kwargs: response)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, '_etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self._etag
+            if self._last_modified:
+                response['Last-Modified'] = http_date(self._last_modified)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    Serve GET requests that were not answered with a 304 from the response
+    cache. Only JSON responses to requests without a session are stored.
+    """
+
+    def _response_cache_key(self):
+        return 'api:response:' + hashlib.sha256('|'.join(self._identity_parts).encode()).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._cache_key = None
+        self._cache_result = None
+        config = get_response_cache_config()
+        if request.method != 'GET' or not config['ENABLED'] or self._identity_parts is None:
+            return
+        if self._precondition_response is not None:
+            return  # Already answered with a 304
+        # The browsable API's HTML carries the session user's CSRF token and
+        # staff-only forms; it must never be shared
+        if request.accepted_renderer.format != 'json':
+            return
+        if isinstance(request.successful_authenticator, SessionAuthentication):
+            return
+
+        view = type(self).__name__
+        self._cache_key = self._response_cache_key()
+        if request.headers.get(BYPASS_HEADER) == '1' and request.user.is_staff:
+            self._cache_result = 'BYPASS'
+        else:
+            cached = cache.get(self._cache_key)
+            if cached is not None:
+                status_code, content_type, content = cached
+                self._cache_result = 'HIT'
+                requests_counter.inc(view=view, result='hit')
+                # dispatch() looks the handler up after initial(), so swapping it
+                # here skips the queryset and serializer entirely
+                self.get = lambda *args, **kwargs: HttpResponse(content, content_type=content_type, status=status_code)
+                return
+            self._cache_result = 'MISS'
+        requests_counter.inc(view=view, result=self._cache_result.lower())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        result = getattr(self, '_cache_result', None)
+        if result is None:
+            return response
+        response['X-Cache'] = result
+        if result != 'HIT' and response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            key, timeout = self._cache_key, get_response_cache_config()['TIMEOUT']
+
+            def store(rendered):
+                cache.set(key, (rendered.status_code, rendered['Content-Type'], rendered.content), timeout)
+
+            response.add_post_render_callback(store)
+        return response
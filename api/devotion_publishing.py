@@ -0,0 +1,114 @@
+"""
+Scheduled devotion pushes, delivered per timezone bucket.
+
+A devotion is announced to each timezone bucket of ``devotions``
+subscribers once it is ``DELIVERY_TIME`` local time on its
+``devotion_date``, or straight away if it is saved later that day. Buckets
+whose local date has already moved past the devotion date are skipped, so
+nobody is told about yesterday's devotion. ``DevotionDelivery`` rows record
+the buckets that have been queued, which makes repeated or overlapping runs
+of ``publish_devotions`` harmless.
+"""
+import logging
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import DeviceSubscription
+from notifications.outbox import enqueue_push_notification
+from notifications.recipients import get_timezone_buckets
+
+from .models import Devotion, DevotionDelivery
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PUBLISHING_CONFIG = {
+    'DELIVERY_TIME': '06:00',  # local time in each timezone bucket
+    'POLL_INTERVAL': 300,  # seconds between publish_devotions runs
+}
+
+
+def get_publishing_config():
+    return {**DEFAULT_PUBLISHING_CONFIG, **getattr(settings, 'DEVOTION_PUBLISHING', {})}
+
+
+def get_delivery_time():
+    return time.fromisoformat(get_publishing_config()['DELIVERY_TIME'])
+
+
+def devotion_notification(devotion):
+    """Return the ``(title, body, data)`` announcing a devotion"""
+    title = "New Devotion Available"
+    preview = (devotion.description[:47] + '...') if len(devotion.description) > 50 else devotion.description
+    body = f"{devotion.title} - {preview}"
+
+    data = {
+        'type': 'new_devotion',
+        'devotion_id': str(devotion.id),
+        'title': devotion.title,
+        'description': devotion.description,
+        'content_type': devotion.content_type,
+        'devotion_date': devotion.devotion_date.isoformat() if devotion.devotion_date else None,
+        'created_at': timezone.now().isoformat(),
+    }
+
+    if devotion.content_type == 'video' and devotion.youtube_url:
+        data['youtube_url'] = devotion.youtube_url
+    return title, body, data
+
+
+def publish_due_devotions(devotions=None, now=None):
+    """
+    Queue the devotion pushes that are due in each timezone bucket.
+
+    Args:
+        devotions (iterable, optional): Devotions to consider. Defaults to
+            every devotion dated within a day of today, which covers all
+            UTC offsets.
+        now (datetime, optional): Current time, for testing.
+
+    Returns:
+        list: The ``DevotionDelivery`` rows created by this run.
+    """
+    now = now or timezone.now()
+    if devotions is None:
+        today = now.date()
+        devotions = Devotion.objects.filter(devotion_date__range=(today - timedelta(days=1), today + timedelta(days=1)))
+    devotions = list(devotions)
+    if not devotions:
+        return []
+
+    delivery_time = get_delivery_time()
+    buckets = []
+    for name in get_timezone_buckets(DeviceSubscription.TOPIC_DEVOTIONS):
+        try:
+            buckets.append((name, ZoneInfo(name)))
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning("Skipping devotion pushes for unknown timezone %r", name)
+
+    queued = set(
+        DevotionDelivery.objects.filter(devotion__in=devotions).values_list('devotion_id', 'timezone')
+    )
+    created = []
+    for devotion in devotions:
+        for name, zone in buckets:
+            if (devotion.id, name) in queued or now.astimezone(zone).date() != devotion.devotion_date:
+                continue
+            scheduled_for = datetime.combine(devotion.devotion_date, delivery_time, tzinfo=zone)
+            if now < scheduled_for:
+                continue
+
+            with transaction.atomic():
+                delivery, is_new = DevotionDelivery.objects.get_or_create(
+                    devotion=devotion, timezone=name, defaults={'scheduled_for': scheduled_for}
+                )
+                if is_new:
+                    title, body, data = devotion_notification(devotion)
+                    enqueue_push_notification(title, body, data, topic=DeviceSubscription.TOPIC_DEVOTIONS, tz=name)
+            if is_new:
+                logger.info("Queued devotion %s push for %s", devotion.id, name)
+                created.append(delivery)
+    return created
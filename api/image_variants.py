@@ -0,0 +1,135 @@
+"""
+Responsive variants of uploaded images.
+
+When a ``ChurchProject``, ``UpcomingEvent``, ``Course`` or ``Module`` image is
+uploaded, it is re-encoded at each of ``WIDTHS`` (never upscaled) in each of
+``FORMATS`` and saved next to the original under ``variants/``, through
+whatever storage the field uses. Re-encoding applies the EXIF orientation and
+drops the rest of the EXIF block (camera details, GPS position). The
+original upload is served too, so before it is stored ``strip_exif``
+rewrites it the same way, in its own format; uploads without EXIF are stored
+byte for byte. ``image_variants`` on the model maps
+``{"<width>": {"webp": name, "jpeg": name}}``, and the serializers turn
+those names into URLs.
+"""
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_VARIANTS_CONFIG = {
+    'WIDTHS': [320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': {'webp': 80, 'jpeg': 82},
+}
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# Re-encoding quality for originals that carried EXIF
+ORIGINAL_QUALITY = 95
+
+
+def get_image_variants_config():
+    return {**DEFAULT_IMAGE_VARIANTS_CONFIG, **getattr(settings, 'IMAGE_VARIANTS', {})}
+
+
+def _encode(image, fmt, quality):
+    buffer = BytesIO()
+    options = {'quality': quality, 'icc_profile': image.info.get('icc_profile')}
+    if fmt == 'jpeg':
+        if image.mode != 'RGB':
+            # JPEG has no alpha channel; flatten onto white like most viewers would
+            flattened = Image.new('RGB', image.size, (255, 255, 255))
+            flattened.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+            image = flattened
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    image.save(buffer, format=fmt.upper(), **options)
+    return buffer.getvalue()
+
+
+def strip_exif(field_file):
+    """
+    The upload in ``field_file`` with its EXIF orientation applied and the EXIF
+    block removed, re-encoded in its own format.
+
+    Returns:
+        ContentFile: The rewritten image, named like the upload, or None when
+        there is no EXIF to remove or the image cannot be decoded.
+    """
+    try:
+        field_file.open('rb')
+        field_file.seek(0)
+        with Image.open(field_file) as original:
+            if not original.getexif() or getattr(original, 'n_frames', 1) > 1:
+                return None  # Nothing to remove, or an animation we would flatten
+            fmt = original.format
+            icc_profile = original.info.get('icc_profile')
+            image = ImageOps.exif_transpose(original)
+            image.load()
+        buffer = BytesIO()
+        options = {'icc_profile': icc_profile} if icc_profile else {}
+        if fmt in ('JPEG', 'WEBP'):
+            options['quality'] = ORIGINAL_QUALITY
+        image.save(buffer, format=fmt, **options)
+    except (OSError, ValueError, UnidentifiedImageError):
+        logger.warning("Cannot re-encode %s; stored without removing EXIF", field_file.name, exc_info=True)
+        return None
+    return ContentFile(buffer.getvalue(), name=posixpath.basename(field_file.name))
+
+
+def build_image_variants(field_file):
+    """
+    Save the variants of ``field_file`` through its storage.
+
+    Returns:
+        dict: ``{"<width>": {"<format>": storage name}}``, or ``{}`` if the
+        image cannot be decoded.
+    """
+    config = get_image_variants_config()
+    try:
+        field_file.open('rb')
+        field_file.seek(0)
+        with Image.open(field_file) as original:
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (OSError, UnidentifiedImageError):
+        logger.exception("Cannot decode %s; no variants generated", field_file.name)
+        return {}
+
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    directory, filename = posixpath.split(field_file.name)
+    stem = posixpath.splitext(filename)[0]
+    variants = {}
+    for width in sorted({min(width, image.width) for width in config['WIDTHS']}):
+        if width == image.width:
+            resized = image
+        else:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        entry = {}
+        for fmt in config['FORMATS']:
+            data = _encode(resized, fmt, config['QUALITY'].get(fmt, 80))
+            name = posixpath.join(directory, 'variants', f'{stem}-{width}.{EXTENSIONS[fmt]}')
+            entry[fmt] = field_file.storage.save(name, ContentFile(data))
+        variants[str(width)] = entry
+    return variants
+
+
+def delete_image_variants(storage, variants):
+    """Remove previously generated variants, e.g. after the image is replaced"""
+    for entry in (variants or {}).values():
+        for name in entry.values():
+            try:
+                storage.delete(name)
+            except Exception:
+                logger.warning("Could not delete image variant %s", name, exc_info=True)
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import tempfile
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from server.storage_backends import FTPStorage
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Upload a large file through FTPStorage to an FTP stand-in that drops connections mid-transfer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=256, help='Size of the test file')
+        parser.add_argument('--drop-after-mb', type=int, default=48,
+                            help='Cut each transfer after this many MB (0 to never drop)')
+        parser.add_argument('--block-sizes', type=int, nargs='+', default=[8192, 256 * 1024, MB],
+                            help='Block sizes to compare, in bytes')
+
+    def handle(self, *args, **options):
+        try:
+            from server.ftp_standin import FTPStandInServer
+        except ImportError:
+            raise CommandError('bench_ftp_resume needs pyftpdlib (pip install pyftpdlib)')
+
+        with tempfile.TemporaryDirectory() as root, tempfile.NamedTemporaryFile() as source:
+            self.stdout.write(f"Writing a {options['size_mb']} MB test file...")
+            digest = hashlib.sha256()
+            for _ in range(options['size_mb']):
+                block = os.urandom(MB)
+                digest.update(block)
+                source.write(block)
+            source.flush()
+
+            server = FTPStandInServer(root, drop_after=options['drop_after_mb'] * MB or None).start()
+            try:
+                header = f"{'block':>9}  {'seconds':>8}  {'MB/s':>7}  {'drops':>5}  {'progress calls':>14}  {'verified':>8}"
+                self.stdout.write(header)
+                self.stdout.write('-' * len(header))
+                for block_size in options['block_sizes']:
+                    self._run(server, root, source.name, digest.hexdigest(), block_size, options['size_mb'])
+            finally:
+                server.stop()
+
+    def _run(self, server, root, source, expected, block_size, size_mb):
+        storage = FTPStorage(**server.storage_options, block_size=block_size, upload_attempts=20, retry_delay=0)
+        name = f'testimonies/videos/bench-{block_size}.bin'
+        server.reset_counts()
+        calls = 0
+
+        def progress(sent, total):
+            nonlocal calls
+            calls += 1
+
+        started = time.perf_counter()
+        with File(open(source, 'rb')) as content:
+            storage._upload(name, content, progress)
+        elapsed = time.perf_counter() - started
+        storage.pool.close()
+
+        digest = hashlib.sha256()
+        with open(os.path.join(root, *name.split('/')), 'rb') as f:
+            for block in iter(lambda: f.read(MB), b''):
+                digest.update(block)
+        verified = 'yes' if digest.hexdigest() == expected else 'NO'
+        self.stdout.write(f'{block_size:>9}  {elapsed:>8.2f}  {size_mb / elapsed:>7.1f}  {server.drops:>5}'
+                          f'  {calls:>14}  {verified:>8}')
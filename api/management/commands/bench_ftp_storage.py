@@ -0,0 +1,116 @@
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ftplib import FTP, error_perm
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+
+from server.storage_backends import FTPStorage
+
+
+class PerOperationFTPStorage(FTPStorage):
+    """The storage as it was before pooling: a fresh login for every call"""
+
+    def _save(self, name, content):
+        ftp = self._connect()
+        try:
+            path_parts = name.split("/")
+            for part in path_parts[:-1]:
+                try:
+                    ftp.mkd(part)
+                except error_perm:
+                    pass
+                ftp.cwd(part)
+            content.open()
+            content.seek(0)
+            ftp.storbinary(f"STOR {path_parts[-1]}", content.file)
+        finally:
+            ftp.quit()
+        return name
+
+    def exists(self, name):
+        try:
+            ftp = self._connect()
+            try:
+                ftp.size(name)
+                return True
+            finally:
+                ftp.quit()
+        except Exception:
+            return False
+
+    def _connect(self):
+        ftp = FTP(timeout=self.timeout)
+        ftp.connect(self.host, self.port)
+        ftp.login(self.username, self.password)
+        ftp.set_pasv(self.passive)
+        ftp.voidcmd("TYPE I")
+        ftp.cwd(self.base_path)
+        return ftp
+
+
+class Command(BaseCommand):
+    help = 'Compare per-operation and pooled FTPStorage uploads against a local FTP stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=200, help='Files saved per run')
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 4],
+                            help='Concurrent uploaders to benchmark')
+        parser.add_argument('--size', type=int, default=64 * 1024, help='Bytes per file')
+        parser.add_argument('--latency', type=float, default=0.01,
+                            help='Stand-in delay before each reply, in seconds (models the round trip)')
+        parser.add_argument('--pool-size', type=int, default=4, help='Connections in the pooled storage')
+
+    def handle(self, *args, **options):
+        try:
+            from server.ftp_standin import FTPStandInServer
+        except ImportError:
+            raise CommandError('bench_ftp_storage needs pyftpdlib (pip install pyftpdlib)')
+
+        with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as staging_root:
+            server = FTPStandInServer(root, latency=options['latency']).start()
+            try:
+                self._bench(server, staging_root, options)
+            finally:
+                server.stop()
+
+    def _bench(self, server, staging_root, options):
+        payload = b'\0' * options['size']
+        self.stdout.write(f"FTP stand-in on {server.address[0]}:{server.address[1]}, "
+                          f"{options['latency'] * 1000:.0f} ms per reply, {options['size']} byte files")
+        header = (f"{'storage':>14}  {'threads':>7}  {'uploads/s':>9}  {'p50 ms':>7}  {'p99 ms':>7}"
+                  f"  {'logins':>6}  {'commands':>8}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for threads in options['threads']:
+            variants = (
+                ('per-operation', PerOperationFTPStorage, {}),
+                ('pooled', FTPStorage, {}),
+                # Request time only; shipping happens in ship_staged_uploads
+                ('staged', FTPStorage, {'staged': True, 'staging_root': staging_root}),
+            )
+            for label, storage_class, extra in variants:
+                storage = storage_class(**server.storage_options, pool_size=options['pool_size'], **extra)
+                server.reset_counts()
+
+                def upload(i):
+                    started = time.perf_counter()
+                    storage.save(f'bench/{label}/{threads}/file-{i}.bin', ContentFile(payload))
+                    return time.perf_counter() - started
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(threads) as executor:
+                    latencies = sorted(executor.map(upload, range(options['uploads'])))
+                elapsed = time.perf_counter() - started
+                storage.pool.close()
+
+                p50 = statistics.median(latencies)
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                self.stdout.write(
+                    f'{label:>14}  {threads:>7}  {len(latencies) / elapsed:>9.1f}  {p50 * 1000:>7.1f}'
+                    f"  {p99 * 1000:>7.1f}  {server.commands.get('USER', 0):>6}"
+                    f'  {sum(server.commands.values()):>8}'
+                )
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.models import PrayerRequest
+from server.benchmarking import scratch_database
+
+SEED_BATCH = 10_000
+
+
+class Command(BaseCommand):
+    help = 'Time /api/prayer-requests/ as a full list and as cursor pages while the table grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10_000, 100_000],
+                            help='Table sizes to benchmark')
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        header = (f"{'rows':>8}  {'full list ms':>12}  {'full KiB':>8}  {'first page ms':>13}"
+                  f"  {'deep page ms':>12}  {'page KiB':>8}  {'deep queries':>12}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        with override_settings(ALLOWED_HOSTS=['*']), scratch_database():
+            seeded = 0
+            for rows in sorted(options['rows']):
+                self._seed(seeded, rows)
+                seeded = rows
+                self._run(rows, options['page_size'])
+
+    def _seed(self, start, end):
+        for offset in range(start, end, SEED_BATCH):
+            PrayerRequest.objects.bulk_create([
+                PrayerRequest(name=f'Bench {i}', email=f'bench{i}@example.com', phone_number='000',
+                              country='CM', request='Please pray for my family and my work this week.')
+                for i in range(offset, min(offset + SEED_BATCH, end))
+            ])
+
+    def _get(self, client, url):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        elapsed = time.perf_counter() - started
+        return response, elapsed * 1000, len(queries.captured_queries)
+
+    def _run(self, rows, page_size):
+        client = Client()
+        full, full_ms, _queries = self._get(client, '/api/prayer-requests/?paginate=false')
+        first, first_ms, _queries = self._get(client, f'/api/prayer-requests/?page_size={page_size}')
+
+        # Walk a cursor 90% of the way down by asking for big pages, then time one page there
+        url = '/api/prayer-requests/?page_size=100'
+        for _ in range(int(rows * 0.9) // 100):
+            url = client.get(url).json()['next']
+        url = url.replace('page_size=100', f'page_size={page_size}')
+        deep, deep_ms, deep_queries = self._get(client, url)
+
+        self.stdout.write(
+            f'{rows:>8}  {full_ms:>12.1f}  {len(full.content) / 1024:>8.0f}  {first_ms:>13.1f}'
+            f'  {deep_ms:>12.1f}  {len(deep.content) / 1024:>8.1f}  {deep_queries:>12}'
+        )
@@ -0,0 +1,64 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+
+from server.media_cache import requests_counter
+from server.storage_backends import FTPStorage
+
+
+class Command(BaseCommand):
+    help = 'Compare repeated FTPStorage reads with and without the local LRU read cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=20, help='Distinct files uploaded')
+        parser.add_argument('--size', type=int, default=2 * 1024 * 1024, help='Bytes per file')
+        parser.add_argument('--reads', type=int, default=200, help='Random reads per run')
+        parser.add_argument('--cache-mb', type=int, default=20,
+                            help='Read cache size; below files x size to exercise eviction')
+        parser.add_argument('--latency', type=float, default=0.01,
+                            help='Stand-in delay before each reply, in seconds')
+
+    def handle(self, *args, **options):
+        try:
+            from server.ftp_standin import FTPStandInServer
+        except ImportError:
+            raise CommandError('bench_media_cache needs pyftpdlib (pip install pyftpdlib)')
+
+        with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as cache_root:
+            server = FTPStandInServer(root, latency=options['latency']).start()
+            try:
+                uploader = FTPStorage(**server.storage_options, read_cache_bytes=0)
+                names = [uploader.save(f'projects/bench-{i}.bin', ContentFile(os.urandom(options['size'])))
+                         for i in range(options['files'])]
+                uploader.pool.close()
+
+                rng = random.Random(42)
+                # Skewed towards a few popular files, like list thumbnails
+                reads = [names[min(int(rng.expovariate(4 / len(names))), len(names) - 1)]
+                         for _ in range(options['reads'])]
+
+                header = f"{'cache':>8}  {'seconds':>8}  {'ms/read':>8}  {'RETRs':>6}  {'hits':>5}  {'misses':>6}"
+                self.stdout.write(header)
+                self.stdout.write('-' * len(header))
+                for label, cache_bytes in (('off', 0), (f"{options['cache_mb']} MB", options['cache_mb'] * 1024 * 1024)):
+                    storage = FTPStorage(**server.storage_options, read_cache_bytes=cache_bytes,
+                                         read_cache_root=cache_root)
+                    requests_counter.reset()
+                    server.reset_counts()
+                    started = time.perf_counter()
+                    for name in reads:
+                        with storage.open(name) as f:
+                            f.read()
+                    elapsed = time.perf_counter() - started
+                    storage.pool.close()
+                    self.stdout.write(
+                        f'{label:>8}  {elapsed:>8.2f}  {elapsed / len(reads) * 1000:>8.1f}'
+                        f"  {server.commands.get('RETR', 0):>6}  {requests_counter.value(result='hit'):>5}"
+                        f"  {requests_counter.value(result='miss') + requests_counter.value(result='stale'):>6}"
+                    )
+            finally:
+                server.stop()
@@ -0,0 +1,87 @@
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from api.models import PrayerRoom, Stream
+from server.benchmarking import scratch_database
+
+POLLED = ['/api/stream/current/', '/api/prayer-room/active/']
+
+
+class Command(BaseCommand):
+    help = ('Poll stream/current/ and prayer-room/active/ from concurrent clients, with the Stream and '
+            'PrayerRoom rows loaded per request and served from process memory')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16],
+                            help='Concurrent polling clients')
+        parser.add_argument('--seconds', type=float, default=3.0, help='How long each run polls')
+
+    def handle(self, *args, **options):
+        header = f"{'threads':>7}  {'singletons':>10}  {'req/s':>8}  {'p50 ms':>7}  {'p99 ms':>7}  {'queries/req':>11}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # The same file cache production falls back to, kept away from the real one
+            caches = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                  'LOCATION': cache_dir}}
+            with override_settings(CACHES=caches, ALLOWED_HOSTS=['*']), scratch_database():
+                room = PrayerRoom.load_prayer_room()
+                room.is_active = True
+                room.youtube_url = 'https://www.youtube.com/watch?v=bench'
+                room.save()
+                Stream.load_stream()
+                for threads in options['threads']:
+                    for label, cached in (('per request', False), ('in memory', True)):
+                        self._run(threads, options['seconds'], label, cached)
+
+    def _run(self, threads, seconds, label, cached):
+        latencies, queries = [], [0]
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def count_queries(execute, sql, params, many, context):
+            with lock:
+                queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def poll():
+            client = Client()
+            mine = []
+            try:
+                with connection.execute_wrapper(count_queries):
+                    while time.perf_counter() < deadline:
+                        for url in POLLED:
+                            started = time.perf_counter()
+                            response = client.get(url)
+                            mine.append(time.perf_counter() - started)
+                            assert response.status_code == 200, (url, response.status_code)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(mine)
+
+        with ExitStack() as stack:
+            if not cached:
+                # What the models did before: load the row on every call
+                stack.enter_context(mock.patch.object(Stream, 'get_stream', Stream.load_stream))
+                stack.enter_context(mock.patch.object(PrayerRoom, 'get_prayer_room', PrayerRoom.load_prayer_room))
+            workers = [threading.Thread(target=poll) for _ in range(threads)]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        self.stdout.write(f'{threads:>7}  {label:>10}  {len(latencies) / elapsed:>8.0f}  {p50:>7.2f}  {p99:>7.2f}'
+                          f'  {queries[0] / len(latencies):>11.2f}')
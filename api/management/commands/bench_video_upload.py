@@ -0,0 +1,121 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+
+from api.models import Testimony
+from api.uploads import get_video_upload_config
+from api.views import TestimonyViewSet
+from server.benchmarking import scratch_database
+
+MB = 1024 * 1024
+BOUNDARY = 'BenchBoundary7MA4YWxkTrZu0gW'
+
+
+class MultipartVideoBody:
+    """A multipart/form-data request body for a testimony, generated as it is read"""
+
+    def __init__(self, size):
+        self.prefix = (
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="name"\r\n\r\nBenchmark\r\n'
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="testimony_video"; filename="bench.mp4"\r\n'
+            f'Content-Type: video/mp4\r\n\r\n'
+        ).encode()
+        self.suffix = f'\r\n--{BOUNDARY}--\r\n'.encode()
+        self.size = size
+        self.length = len(self.prefix) + size + len(self.suffix)
+        self.block = b'\x00\x00\x00\x18ftypmp42' + os.urandom(MB - 12)
+        self.position = 0
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = self.length - self.position
+        n = min(n, self.length - self.position)
+        out = bytearray()
+        while len(out) < n:
+            pos = self.position
+            if pos < len(self.prefix):
+                piece = self.prefix[pos:pos + n - len(out)]
+            elif pos < len(self.prefix) + self.size:
+                offset = pos - len(self.prefix)
+                remaining = min(n - len(out), self.size - offset)
+                start = offset % MB
+                piece = self.block[start:start + remaining]
+            else:
+                start = pos - len(self.prefix) - self.size
+                piece = self.suffix[start:start + n - len(out)]
+            out += piece
+            self.position += len(piece)
+        return bytes(out)
+
+    def readline(self, limit=-1):
+        line = b''
+        while not line.endswith(b'\n') and len(line) != limit and self.position < self.length:
+            line += self.read(1)
+        return line
+
+
+class Command(BaseCommand):
+    help = 'Compare buffered and streamed testimony video uploads through TestimonyViewSet against an FTP stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes-mb', type=int, nargs='+', default=[100, 500, 1000],
+                            help='Video sizes to upload')
+
+    def handle(self, *args, **options):
+        try:
+            from server.ftp_standin import FTPStandInServer
+        except ImportError:
+            raise CommandError('bench_video_upload needs pyftpdlib (pip install pyftpdlib)')
+
+        with tempfile.TemporaryDirectory() as root:
+            server = FTPStandInServer(root).start()
+            storages = {
+                'default': {
+                    'BACKEND': 'server.storage_backends.FTPStorage',
+                    'OPTIONS': {**server.storage_options, 'staged': False, 'read_cache_bytes': 0},
+                },
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            }
+            header = f"{'MB':>6}  {'handler':>9}  {'seconds':>8}  {'MB/s':>7}  {'peak MiB':>8}  {'stored':>6}"
+            self.stdout.write(header)
+            self.stdout.write('-' * len(header))
+            try:
+                with override_settings(STORAGES=storages), scratch_database():
+                    for size_mb in options['sizes_mb']:
+                        for label, streaming in (('buffered', False), ('streamed', True)):
+                            self._run(label, streaming, size_mb, root)
+            finally:
+                server.stop()
+
+    def _run(self, label, streaming, size_mb, root):
+        config = {**get_video_upload_config(), 'STREAM_TO_STORAGE': streaming, 'MAX_BYTES': 2 * size_mb * MB}
+        body = MultipartVideoBody(size_mb * MB)
+        environ = RequestFactory()._base_environ(
+            PATH_INFO='/api/testimonies/',
+            REQUEST_METHOD='POST',
+            CONTENT_TYPE=f'multipart/form-data; boundary={BOUNDARY}',
+            CONTENT_LENGTH=str(body.length),
+        )
+        environ['wsgi.input'] = body
+        view = TestimonyViewSet.as_view({'post': 'create'})
+
+        with override_settings(VIDEO_UPLOADS=config):
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = view(WSGIRequest(environ))
+            elapsed = time.perf_counter() - started
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        if response.status_code != 201:
+            raise CommandError(f'{label} upload failed: {response.status_code} {response.data}')
+        testimony = Testimony.objects.get(pk=response.data['id'])
+        stored = os.path.getsize(os.path.join(root, *testimony.testimony_video.name.split('/')))
+        self.stdout.write(f'{size_mb:>6}  {label:>9}  {elapsed:>8.2f}  {size_mb / elapsed:>7.0f}'
+                          f"  {peak / MB:>8.1f}  {'ok' if stored == size_mb * MB else 'SHORT':>6}")
+        os.remove(os.path.join(root, *testimony.testimony_video.name.split('/')))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.image_variants import build_image_variants, delete_image_variants
+from api.models import ChurchProject, Course, Module, UpcomingEvent
+
+MODELS = (ChurchProject, UpcomingEvent, Course, Module)
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive image variants for rows uploaded before they existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Regenerate variants for every image, e.g. after changing IMAGE_VARIANTS')
+
+    def handle(self, *args, **options):
+        for model in MODELS:
+            rows = model.objects.exclude(image='')
+            if not options['rebuild']:
+                rows = rows.filter(image_variants={})
+            built = 0
+            for row in rows.iterator():
+                delete_image_variants(row.image.storage, row.image_variants)
+                variants = build_image_variants(row.image)
+                row.image.close()
+                if variants:
+                    row.image_variants = variants
+                    row.save(update_fields=['image_variants'])
+                    built += 1
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {built} image(s) processed')
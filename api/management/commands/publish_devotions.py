@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.devotion_publishing import get_publishing_config, publish_due_devotions
+
+
+class Command(BaseCommand):
+    help = "Queue devotion pushes for every timezone that has reached the devotion's local delivery time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running instead of exiting after one pass (e.g. when not using cron)')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds between passes with --loop (default: DEVOTION_PUBLISHING["POLL_INTERVAL"])')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or get_publishing_config()['POLL_INTERVAL']
+        try:
+            while True:
+                deliveries = publish_due_devotions()
+                for delivery in deliveries:
+                    self.stdout.write(f'Queued "{delivery.devotion.title}" for {delivery.timezone}')
+                if not options['loop']:
+                    if not deliveries:
+                        self.stdout.write('No devotion pushes due')
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Devotion publisher stopped')
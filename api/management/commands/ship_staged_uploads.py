@@ -0,0 +1,60 @@
+import logging
+import time
+from ftplib import all_errors
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Upload files staged on local disk by FTPStorage to the FTP host'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running instead of exiting after one pass')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds to sleep with --loop when nothing is pending')
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'pending_names'):
+            raise CommandError('The default storage does not stage uploads')
+
+        try:
+            while True:
+                shipped = self._ship_pending()
+                if not options['loop']:
+                    if not shipped:
+                        self.stdout.write('No staged uploads pending')
+                    break
+                if not shipped:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Staged upload shipper stopped')
+
+    def _ship_pending(self):
+        shipped = 0
+        for name in default_storage.pending_names():
+            started = time.perf_counter()
+            try:
+                default_storage.ship(name, self._progress_reporter(name))
+            except (OSError, *all_errors) as e:
+                # Left in place and retried on the next pass
+                logger.error("Shipping staged upload %s failed: %s", name, e)
+                self.stderr.write(f'Failed to ship {name}: {e}')
+                continue
+            shipped += 1
+            self.stdout.write(f'Shipped {name} in {time.perf_counter() - started:.1f}s')
+        return shipped
+
+    def _progress_reporter(self, name):
+        reported = 0
+
+        def report(sent, total):
+            nonlocal reported
+            quarter = 4 * sent // total if total else 4
+            if quarter > reported and quarter < 4:
+                reported = quarter
+                self.stdout.write(f'  {name}: {sent / total:.0%} of {total / 1024 / 1024:.1f} MB')
+        return report
@@ -0,0 +1,74 @@
+"""
+Remove stored files once no row points at them.
+
+Django leaves a ``FileField``'s file in storage when the row is deleted or
+the field is given a new file. For the models registered here, the old file
+(and, for ``ImageVariantsModel``, the variants of a deleted row's image) is
+deleted from storage after the transaction commits. Files another row of the
+same model still names are kept.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .image_variants import delete_image_variants
+
+logger = logging.getLogger(__name__)
+
+
+def _file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, FileField)]
+
+
+def _delete_later(model, field, name, variants=None):
+    def delete():
+        if model._default_manager.filter(**{field.name: name}).exists():
+            return  # Still in use
+        try:
+            field.storage.delete(name)
+            if variants:
+                delete_image_variants(field.storage, variants)
+        except Exception:
+            logger.warning("Could not remove %s from storage", name, exc_info=True)
+
+    transaction.on_commit(delete)
+
+
+def _remember_replaced(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._replaced_files = []
+    if raw or instance.pk is None:
+        return
+    fields = [field for field in _file_fields(sender) if update_fields is None or field.name in update_fields]
+    if not fields:
+        return
+    old = sender._default_manager.filter(pk=instance.pk).values(*[field.attname for field in fields]).first()
+    if old is None:
+        return
+    for field in fields:
+        old_name = old[field.attname]
+        if old_name and old_name != getattr(instance, field.attname).name:
+            instance._replaced_files.append((field, old_name))
+
+
+def _delete_replaced(sender, instance, raw=False, **kwargs):
+    for field, name in getattr(instance, '_replaced_files', ()):
+        _delete_later(sender, field, name)
+    instance._replaced_files = []
+
+
+def _delete_files(sender, instance, **kwargs):
+    for field in _file_fields(sender):
+        name = getattr(instance, field.attname).name
+        if name:
+            variants = getattr(instance, 'image_variants', None) if field.name == 'image' else None
+            _delete_later(sender, field, name, variants)
+
+
+def connect_file_cleanup(models):
+    for model in models:
+        uid = f'api-files-{model._meta.label_lower}'
+        pre_save.connect(_remember_replaced, sender=model, dispatch_uid=uid)
+        post_save.connect(_delete_replaced, sender=model, dispatch_uid=uid)
+        post_delete.connect(_delete_files, sender=model, dispatch_uid=uid)
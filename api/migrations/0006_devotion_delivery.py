@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_alter_stream_options_remove_stream_is_live_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DevotionDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.CharField(max_length=64)),
+                ('scheduled_for', models.DateTimeField(help_text='Local delivery time in this timezone')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the push was queued')),
+                ('devotion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='api.devotion')),
+            ],
+            options={
+                'verbose_name_plural': 'Devotion deliveries',
+                'ordering': ['scheduled_for'],
+                'unique_together': {('devotion', 'timezone')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_devotion_delivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='churchproject',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized WebP/JPEG copies of the image, by width'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized WebP/JPEG copies of the image, by width'),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized WebP/JPEG copies of the image, by width'),
+        ),
+        migrations.AddField(
+            model_name='upcomingevent',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized WebP/JPEG copies of the image, by width'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['video', '-created_at', '-id'], name='api_comment_video_i_c4dff3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courseapplication',
+            index=models.Index(fields=['-created_at', '-id'], name='api_coursea_created_b9b551_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devotion',
+            index=models.Index(fields=['-devotion_date', '-created_at', '-id'], name='api_devotio_devotio_161dcc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prayerrequest',
+            index=models.Index(fields=['-created_at', '-id'], name='api_prayerr_created_c426a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testimony',
+            index=models.Index(fields=['-created_at', '-id'], name='api_testimo_created_d63903_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['category', 'id'], name='api_video_categor_d0d909_idx'),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.core.validators import URLValidator
 
+from .caching import CachedSingleton
+from .image_variants import build_image_variants, delete_image_variants, strip_exif
+
 
 class User(AbstractUser):
     name = models.CharField(max_length=255)
@@ -14,7 +17,34 @@ class User(AbstractUser):
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email', 'name', 'country', 'contact']
 
-class ChurchProject(models.Model):
+class ImageVariantsModel(models.Model):
+    """Keeps responsive variants of ``image`` in step with each new upload (api/image_variants.py)"""
+    image_variants = models.JSONField(default=dict, blank=True, editable=False,
+                                      help_text="Resized WebP/JPEG copies of the image, by width")
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        new_upload = bool(self.image) and not self.image._committed
+        stale_variants = self.image_variants if new_upload or not self.image else None
+        if not self.image:
+            self.image_variants = {}
+        if new_upload:
+            # The original is served as well as the variants
+            stripped = strip_exif(self.image)
+            if stripped is not None:
+                self.image = stripped
+        super().save(*args, **kwargs)
+
+        if stale_variants:
+            delete_image_variants(self.image.storage, stale_variants)
+        if new_upload:
+            self.image_variants = build_image_variants(self.image)
+            # A second save rather than update(), so post_save listeners see the variants
+            super().save(update_fields=['image_variants'])
+
+class ChurchProject(ImageVariantsModel):
     title = models.CharField(max_length=255)
     description = models.TextField()
     image = models.ImageField(upload_to='projects/', max_length=500)
@@ -42,6 +72,10 @@ class Video(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # by_category pages through one category in id order
+        indexes = [models.Index(fields=['category', 'id'])]
+
     def __str__(self):
         return f"{self.title} - {self.category}"
 
@@ -89,6 +123,11 @@ class Stream(models.Model):
 
     @classmethod
     def get_stream(cls):
+        """Get the single stream instance, from process memory until it changes"""
+        return stream_singleton.get()
+
+    @classmethod
+    def load_stream(cls):
         """Get the single stream instance, create it if it doesn't exist"""
         stream, created = cls.objects.get_or_create(
             pk=1,
@@ -110,6 +149,9 @@ class PrayerRequest(models.Model):
     request = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['-created_at', '-id'])]
+
     def __str__(self):
         return f"Prayer Request from {self.name}"
 
@@ -127,10 +169,13 @@ class Testimony(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['-created_at', '-id'])]
+
     def __str__(self):
         return f"Testimony from {self.name}"
 
-class UpcomingEvent(models.Model):
+class UpcomingEvent(ImageVariantsModel):
     EVENT_STATUS_CHOICES = [
         ('upcoming', 'Upcoming'),
         ('past', 'Past'),
@@ -215,13 +260,20 @@ class PrayerRoom(models.Model):
 
     @classmethod
     def get_prayer_room(cls):
+        """Get the single prayer room instance, from process memory until it changes"""
+        return prayer_room_singleton.get()
+
+    @classmethod
+    def load_prayer_room(cls):
         """Get the single prayer room instance, create it if it doesn't exist"""
-        if not cls.objects.exists():
-            return cls.objects.create()
-        return cls.objects.first() 
+        return cls.objects.first() or cls.objects.create()
+
+
+stream_singleton = CachedSingleton(Stream, Stream.load_stream)
+prayer_room_singleton = CachedSingleton(PrayerRoom, PrayerRoom.load_prayer_room)
 
 # Courses/Modules/Videos hierarchy
-class Course(models.Model):
+class Course(ImageVariantsModel):
     CATEGORY_CHOICES = [
         ('sons_of_john_chi', 'Sons of John Chi'),
         ('mentorship', 'Mentorship'),
@@ -236,7 +288,7 @@ class Course(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_category_display()})"
 
-class Module(models.Model):
+class Module(ImageVariantsModel):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='modules')
     name = models.CharField(max_length=255)
     description = models.TextField()
@@ -281,6 +333,7 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['video', '-created_at', '-id'])]
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.video.name}"
@@ -301,6 +354,7 @@ class Devotion(models.Model):
     
     class Meta:
         ordering = ['-devotion_date', '-created_at']
+        indexes = [models.Index(fields=['-devotion_date', '-created_at', '-id'])]
     
     def __str__(self):
         return f"{self.title} - {self.devotion_date}"
@@ -319,6 +373,21 @@ class Devotion(models.Model):
                     return f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
         return None
 
+class DevotionDelivery(models.Model):
+    """Timezone bucket a devotion push has been queued for, by ``publish_devotions``"""
+    devotion = models.ForeignKey(Devotion, on_delete=models.CASCADE, related_name='deliveries')
+    timezone = models.CharField(max_length=64)
+    scheduled_for = models.DateTimeField(help_text="Local delivery time in this timezone")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the push was queued")
+    
+    class Meta:
+        unique_together = [['devotion', 'timezone']]
+        ordering = ['scheduled_for']
+        verbose_name_plural = "Devotion deliveries"
+    
+    def __str__(self):
+        return f"{self.devotion.title} - {self.timezone}"
+
 class CourseApplication(models.Model):
     APPLICATION_TYPE_CHOICES = [
         ('sons_of_john_chi', 'Sons of John Chi'),
@@ -357,6 +426,7 @@ class CourseApplication(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['-created_at', '-id'])]
         # Allow same email for different application types, but not for the same type
         unique_together = [['email', 'application_type']]
     
@@ -0,0 +1,150 @@
+"""
+Cursor (keyset) pagination for the list endpoints in ``api.views``.
+
+Pages are keyed on the queryset's own ordering (its ``order_by``, else the
+model's ``Meta.ordering``, else the primary key) with the primary key as a
+tie-breaker, so fetching a page is an indexed range scan however deep the
+client has scrolled. Responses look like::
+
+    {"next": "<url with ?cursor=...>", "previous": null, "results": [...]}
+
+``?page_size=`` picks the page size, up to ``MAX_PAGE_SIZE``. Clients that
+still expect a bare list send ``?paginate=false``. Setting
+``API_PAGINATION['PAGINATE_BY_DEFAULT']`` to False keeps the bare list as the
+default until every client sends a cursor.
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+
+DEFAULT_PAGINATION_CONFIG = {
+    'PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': 100,
+    'PAGINATE_BY_DEFAULT': True,
+}
+
+OPT_OUT_VALUES = ('false', '0', 'no')
+
+
+def get_pagination_config():
+    return {**DEFAULT_PAGINATION_CONFIG, **getattr(settings, 'API_PAGINATION', {})}
+
+
+def ordering_for(queryset):
+    """The queryset's effective ordering, ending in a unique primary key term"""
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering or [])
+    if not ordering:
+        return ('pk',)
+    if not any(term.lstrip('-') in ('pk', 'id') for term in ordering):
+        ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+    return tuple(ordering)
+
+
+def _flip(term):
+    return term[1:] if term.startswith('-') else f'-{term}'
+
+
+def _after(ordering, position):
+    """
+    Rows strictly after ``position`` in ``ordering``: the row-value
+    comparison ``(a, b, pk) > (x, y, z)`` spelled out as OR-ed prefixes. The
+    leading ``a >= x`` bound lets the ordering's index answer it as a range
+    scan.
+    """
+    condition = Q()
+    equal = {}
+    for term, value in zip(ordering, position):
+        field = term.lstrip('-')
+        lookup = 'lt' if term.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{field}__{lookup}': value})
+        equal[field] = value
+    first = ordering[0]
+    bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+    return bound & condition
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    DRF's cursor pagination positions on the first ordering field only and
+    skips ties by offset, which breaks down for orderings such as
+    ``devotion_date``. This keeps the full tuple of ordering values in the
+    cursor and filters on all of them instead.
+    """
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        config = get_pagination_config()
+        self.page_size = config['PAGE_SIZE']
+        self.max_page_size = config['MAX_PAGE_SIZE']
+        self.paginate_by_default = config['PAGINATE_BY_DEFAULT']
+
+    def wants_pagination(self, request):
+        requested = request.query_params.get('paginate')
+        if requested is not None:
+            return requested.lower() not in OPT_OUT_VALUES
+        return self.paginate_by_default or self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.wants_pagination(request):
+            return None
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = ordering_for(queryset)
+
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor.reverse)
+        position = None
+        if cursor and cursor.position:
+            try:
+                position = json.loads(cursor.position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise NotFound(self.invalid_cursor_message)
+
+        ordering = [_flip(term) for term in self.ordering] if self.reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(_after(ordering, position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def _position(self, instance):
+        return json.dumps([str(getattr(instance, term.lstrip('-'))) for term in self.ordering])
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
+
+
+class PaginatedActionMixin:
+    """``paginated_response`` for extra list actions, which DRF leaves unpaginated"""
+
+    def paginated_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
@@ -4,14 +4,16 @@ from rest_framework.response import Response
 from django.utils import timezone
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
+from .caching import ConditionalGetMixin
 from .models import PrayerRoom
 from .serializers import PrayerRoomSerializer
 
-class PrayerRoomViewSet(viewsets.ViewSet):
+class PrayerRoomViewSet(ConditionalGetMixin, viewsets.ViewSet):
     """
     API endpoint for managing the prayer room with YouTube streaming.
     """
     permission_classes = [permissions.AllowAny]
+    cache_models = [PrayerRoom]
     
     def get_prayer_room(self):
         """Get or create the single prayer room instance"""
@@ -28,7 +28,33 @@ class UserSerializer(serializers.ModelSerializer):
         )
         return user
 
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only map of image variant URLs by width and format, e.g.
+    ``{"320": {"webp": "https://.../x-320.webp", "jpeg": "..."}, "640": {...}}``
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance
+
+    def to_representation(self, instance):
+        storage = instance.image.storage
+        request = self.context.get('request')
+        variants = {}
+        for width, entry in sorted((instance.image_variants or {}).items(), key=lambda item: int(item[0])):
+            urls = {fmt: storage.url(name) for fmt, name in entry.items()}
+            if request is not None:
+                urls = {fmt: request.build_absolute_uri(url) for fmt, url in urls.items()}
+            variants[width] = urls
+        return variants
+
 class ChurchProjectSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = ChurchProject
         fields = '__all__'
@@ -125,17 +151,23 @@ class TestimonySerializer(serializers.ModelSerializer):
         }
 
 class UpcomingEventSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = UpcomingEvent
         fields = '__all__'
 
 
 class CourseSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Course
         fields = '__all__'
 
 class ModuleSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Module
         fields = '__all__'
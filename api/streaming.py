@@ -3,12 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
 
+from .caching import ConditionalGetMixin
 from .models import Stream
 from .serializers import StreamSerializer
 
 
-class StreamViewSet(viewsets.ModelViewSet):
+class StreamViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = StreamSerializer
+    cache_models = [Stream]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     http_method_names = ['get', 'put', 'patch', 'delete', 'head', 'options']  # Allow DELETE method
 
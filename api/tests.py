@@ -1,3 +1,88 @@
-from django.test import TestCase
+import hashlib
+import os
+import tempfile
+from io import BytesIO
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import ExifTags, Image
+
+from server.ftp_standin import FTPStandInServer  # requirements-dev.txt
+from server.storage_backends import FTPStorage
+
+from .models import ChurchProject
+
+MB = 1024 * 1024
+
+
+class FTPResumeTests(SimpleTestCase):
+    """Uploads through FTPStorage survive an FTP host that cuts long transfers"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.server = FTPStandInServer(self.root, drop_after=3 * MB).start()
+        self.storage = FTPStorage(**self.server.storage_options, staged=False, read_cache_bytes=0,
+                                  upload_attempts=10, retry_delay=0)
+
+    def tearDown(self):
+        self.storage.pool.close()
+        self.server.stop()
+
+    def test_dropped_upload_resumes_to_the_same_bytes(self):
+        data = os.urandom(8 * MB)
+
+        name = self.storage.save('testimonies/videos/resume.bin', ContentFile(data))
+
+        with open(os.path.join(self.root, *name.split('/')), 'rb') as f:
+            stored = f.read()
+        self.assertGreaterEqual(self.server.drops, 2)
+        self.assertEqual(len(stored), len(data))
+        self.assertEqual(hashlib.sha256(stored).hexdigest(), hashlib.sha256(data).hexdigest())
+        self.assertEqual(self.storage.size(name), len(data))
+
+
+class ImageExifTests(TestCase):
+    """Stored originals and their variants carry no EXIF, so no GPS position is served"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storages = {'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}}
+        settings = override_settings(STORAGES=storages, MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _jpeg_with_gps(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Make] = 'Camera'
+        exif[ExifTags.Base.Orientation] = 6  # Stored sideways, shown rotated 90 degrees
+        exif.get_ifd(ExifTags.IFD.GPSInfo).update({
+            ExifTags.GPS.GPSLatitudeRef: 'S',
+            ExifTags.GPS.GPSLatitude: (1.0, 17.0, 30.0),
+            ExifTags.GPS.GPSLongitudeRef: 'E',
+            ExifTags.GPS.GPSLongitude: (36.0, 49.0, 10.0),
+        })
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200), (200, 30, 30)).save(buffer, format='JPEG', exif=exif)
+        return buffer.getvalue()
+
+    def test_stored_original_has_no_gps(self):
+        data = self._jpeg_with_gps()
+        with Image.open(BytesIO(data)) as uploaded:
+            self.assertTrue(uploaded.getexif().get_ifd(ExifTags.IFD.GPSInfo))
+
+        project = ChurchProject.objects.create(
+            title='Roof', description='New roof',
+            image=SimpleUploadedFile('roof.jpg', data, content_type='image/jpeg'))
+
+        project.image.open('rb')
+        with project.image, Image.open(project.image) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (200, 400))  # Orientation applied
+            exif = stored.getexif()
+            self.assertFalse(exif.get_ifd(ExifTags.IFD.GPSInfo))
+            self.assertNotIn(ExifTags.Base.Make, exif)
+        self.assertTrue(project.image_variants)
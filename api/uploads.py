@@ -0,0 +1,142 @@
+"""
+Streaming uploads for testimony videos.
+
+Django's default handlers buffer an uploaded file to a temporary file, and
+the storage then reads it back to send it on. ``StreamingVideoUploadHandler``
+passes each multipart chunk straight to the storage's upload stream instead
+(``FTPStorage.open_upload_stream``), so the transfer to the FTP host (or the
+staging directory) runs while the request body is still arriving.
+
+The upload is validated as early as possible. The declared request length
+is checked before any of the body is read, the file name and declared type
+when the file part starts, the container signature on its first chunk, and
+the running size on every chunk. A rejected upload aborts the stream and
+surfaces as a 400 through DRF's multipart parser.
+"""
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from django.http.multipartparser import MultiPartParserError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VIDEO_UPLOAD_CONFIG = {
+    'STREAM_TO_STORAGE': True,  # False falls back to Django's buffering handlers
+    'MAX_BYTES': 1024 * 1024 * 1024,
+    'EXTENSIONS': ['.mp4', '.m4v', '.mov', '.webm', '.ogg', '.ogv'],
+    'CONTENT_TYPES': ['video/mp4', 'video/quicktime', 'video/webm', 'video/ogg', 'application/octet-stream'],
+}
+
+
+def get_video_upload_config():
+    return {**DEFAULT_VIDEO_UPLOAD_CONFIG, **getattr(settings, 'VIDEO_UPLOADS', {})}
+
+
+class UploadRejected(MultiPartParserError):
+    pass
+
+
+def looks_like_video(head):
+    """Whether the first bytes of a file match an MP4/QuickTime, WebM or Ogg container"""
+    return (
+        head[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free')  # ISO base media / QuickTime
+        or head.startswith(b'\x1a\x45\xdf\xa3')  # EBML (WebM, Matroska)
+        or head.startswith(b'OggS')
+    )
+
+
+class StreamedUploadedFile(UploadedFile):
+    """
+    An upload that is already in storage under ``storage_name``.
+
+    Views must save the model with that name rather than the file itself,
+    otherwise the storage would be asked to store it a second time.
+    """
+
+    def __init__(self, storage_name, name, content_type, size, charset=None, content_type_extra=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.storage_name = storage_name
+
+    def open(self, mode=None):
+        raise ValueError("A streamed upload is only available through the storage")
+
+
+class StreamingVideoUploadHandler(FileUploadHandler):
+    """
+    Stream the ``field_name`` file part to ``field``'s storage.
+
+    Args:
+        field: The model ``FileField`` the upload is for; it supplies the
+            storage and the ``upload_to`` name.
+    """
+
+    def __init__(self, request, field, field_name=None):
+        super().__init__(request)
+        self.field = field
+        self.field_name = field_name or field.name
+        self.config = get_video_upload_config()
+        self.stream = None
+        self.head = b''
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.config['MAX_BYTES'] + 64 * 1024:  # room for the other form fields
+            raise UploadRejected(f"Upload exceeds the {self.config['MAX_BYTES']} byte limit")
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name != self.field_name:
+            return
+
+        extension = posixpath.splitext(file_name)[1].lower()
+        if extension not in self.config['EXTENSIONS']:
+            raise UploadRejected(f"Unsupported video file extension {extension!r}")
+        if content_type not in self.config['CONTENT_TYPES']:
+            raise UploadRejected(f"Unsupported video content type {content_type!r}")
+        if content_length and content_length > self.config['MAX_BYTES']:
+            raise UploadRejected(f"Video exceeds the {self.config['MAX_BYTES']} byte limit")
+
+        storage = self.field.storage
+        if not hasattr(storage, 'open_upload_stream'):
+            return  # Let the default handlers buffer it
+        self.stream = storage.open_upload_stream(self.field.generate_filename(None, file_name))
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.stream is None:
+            return raw_data
+        try:
+            if len(self.head) < 16:
+                self.head += raw_data[:16]
+                if len(self.head) >= 16 and not looks_like_video(self.head):
+                    raise UploadRejected("The uploaded file is not a supported video")
+            if start + len(raw_data) > self.config['MAX_BYTES']:
+                raise UploadRejected(f"Video exceeds the {self.config['MAX_BYTES']} byte limit")
+            self.stream.write(raw_data)
+        except BaseException:
+            self._abort()
+            raise
+        return None
+
+    def file_complete(self, file_size):
+        if self.stream is None:
+            return None
+        stream, self.stream = self.stream, None
+        if len(self.head) < 16 and not looks_like_video(self.head):
+            stream.abort()
+            raise UploadRejected("The uploaded file is not a supported video")
+        storage_name = stream.close()
+        logger.info("Streamed %s (%s bytes) to storage as %s", self.file_name, file_size, storage_name)
+        return StreamedUploadedFile(
+            storage_name, self.file_name, self.content_type, file_size, self.charset, self.content_type_extra
+        )
+
+    def upload_interrupted(self):
+        self._abort()
+
+    def _abort(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.abort()
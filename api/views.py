@@ -1,4 +1,5 @@
 import logging
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from rest_framework import viewsets, status, permissions, generics
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
@@ -6,9 +7,12 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password, check_password
 from rest_framework_simplejwt.tokens import RefreshToken
-from notifications.views import send_push_notification
 from django.utils import timezone
 
+from .caching import CachedResponseMixin, ConditionalGetMixin
+from .devotion_publishing import publish_due_devotions
+from .pagination import PaginatedActionMixin
+from .uploads import StreamedUploadedFile, StreamingVideoUploadHandler, get_video_upload_config
 from .models import (
     User, ChurchProject, Video, InspirationQuote, 
     PrayerRequest, Testimony, UpcomingEvent,
@@ -101,19 +105,22 @@ class LoginView(generics.GenericAPIView):
             status=status.HTTP_401_UNAUTHORIZED
         )
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    cache_models = [User]
     permission_classes = [AllowAny]
 
-class ChurchProjectViewSet(viewsets.ModelViewSet):
+class ChurchProjectViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = ChurchProject.objects.all()
     serializer_class = ChurchProjectSerializer
+    cache_models = [ChurchProject]
     permission_classes = [AllowAny]
 
-class VideoViewSet(viewsets.ModelViewSet):
+class VideoViewSet(CachedResponseMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     queryset = Video.objects.all()
     serializer_class = VideoSerializer
+    cache_models = [Video]
     permission_classes = [AllowAny]
 
     @action(detail=False, methods=['get'])
@@ -121,25 +128,66 @@ class VideoViewSet(viewsets.ModelViewSet):
         category = request.query_params.get('category', None)
         if category:
             videos = self.queryset.filter(category=category)
-            serializer = self.get_serializer(videos, many=True)
-            return Response(serializer.data)
+            return self.paginated_response(videos)
         return Response({'error': 'Category parameter is required'}, status=400)
 
-class InspirationQuoteViewSet(viewsets.ModelViewSet):
+class InspirationQuoteViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = InspirationQuote.objects.all().order_by('-created_at')
     serializer_class = InspirationQuoteSerializer
+    cache_models = [InspirationQuote]
     permission_classes = [AllowAny]
 
-class PrayerRequestViewSet(viewsets.ModelViewSet):
+class PrayerRequestViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = PrayerRequest.objects.all().order_by('-created_at')
     serializer_class = PrayerRequestSerializer
+    cache_models = [PrayerRequest]
     permission_classes = [AllowAny]
 
-class TestimonyViewSet(viewsets.ModelViewSet):
+class TestimonyViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Testimony.objects.all().order_by('-created_at')
     serializer_class = TestimonySerializer
+    cache_models = [Testimony]
     permission_classes = [AllowAny]
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Upload handlers must be in place before the body is parsed
+        if request.method in ('POST', 'PUT', 'PATCH') and get_video_upload_config()['STREAM_TO_STORAGE']:
+            field = Testimony._meta.get_field('testimony_video')
+            request.upload_handlers.insert(0, StreamingVideoUploadHandler(request, field))
+        return super().initialize_request(request, *args, **kwargs)
+
+    def _save_streamed(self, serializer):
+        video = serializer.validated_data.get('testimony_video')
+        if isinstance(video, StreamedUploadedFile):
+            # Already in storage; saving the name keeps it from being stored twice
+            serializer.save(testimony_video=video.storage_name)
+        else:
+            serializer.save()
+
+    def perform_create(self, serializer):
+        self._save_streamed(serializer)
+
+    def perform_update(self, serializer):
+        self._save_streamed(serializer)
+
+    def handle_exception(self, exc):
+        # A body that broke off mid-file (client gone) fails inside the
+        # multipart parser, which never tells the handler; abort its stream
+        for handler in getattr(self.request, 'upload_handlers', ()):
+            if isinstance(handler, StreamingVideoUploadHandler):
+                handler.upload_interrupted()
+
+        # Remove a streamed video whose request failed validation or saving
+        files = getattr(self.request, '_files', None)  # Only if the body was parsed
+        video = files.get('testimony_video') if hasattr(files, 'get') else None
+        if isinstance(video, StreamedUploadedFile):
+            try:
+                Testimony._meta.get_field('testimony_video').storage.delete(video.storage_name)
+            except Exception:
+                logging.getLogger('api.views').warning(
+                    "Could not remove streamed video %s", video.storage_name, exc_info=True)
+        return super().handle_exception(exc)
+
     # def perform_create(self, serializer):
     #     serializer.save(user=self.request.user)
 
@@ -150,9 +198,10 @@ class IsAdminOrReadOnly(permissions.BasePermission):
             return True
         return bool(request.user and request.user.is_authenticated and request.user.is_staff)
 
-class UpcomingEventViewSet(viewsets.ModelViewSet):
+class UpcomingEventViewSet(CachedResponseMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     queryset = UpcomingEvent.objects.all().order_by('-event_date')
     serializer_class = UpcomingEventSerializer
+    cache_models = [UpcomingEvent]
     permission_classes = [IsAdminOrReadOnly]
     
     def get_queryset(self):
@@ -174,19 +223,18 @@ class UpcomingEventViewSet(viewsets.ModelViewSet):
     def upcoming(self, request):
         """Get only upcoming events"""
         upcoming_events = self.queryset.filter(event_status='upcoming')
-        serializer = self.get_serializer(upcoming_events, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(upcoming_events)
     
     @action(detail=False, methods=['get'])
     def past(self, request):
         """Get only past events"""
         past_events = self.queryset.filter(event_status='past')
-        serializer = self.get_serializer(past_events, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(past_events)
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all().order_by('-created_at')
     serializer_class = CourseSerializer
+    cache_models = [Course]
     permission_classes = [IsAdminOrReadOnly]
 
     def get_queryset(self):
@@ -196,9 +244,10 @@ class CourseViewSet(viewsets.ModelViewSet):
             qs = qs.filter(category=category)
         return qs
 
-class ModuleViewSet(viewsets.ModelViewSet):
+class ModuleViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Module.objects.all().order_by('-created_at')
     serializer_class = ModuleSerializer
+    cache_models = [Module]
     permission_classes = [IsAdminOrReadOnly]
 
     def get_queryset(self):
@@ -208,9 +257,10 @@ class ModuleViewSet(viewsets.ModelViewSet):
             qs = qs.filter(course_id=course_id)
         return qs
 
-class CourseVideoViewSet(viewsets.ModelViewSet):
+class CourseVideoViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = CourseVideo.objects.all().order_by('-created_at')
     serializer_class = CourseVideoSerializer
+    cache_models = [CourseVideo]
     permission_classes = [IsAdminOrReadOnly]
 
     def get_queryset(self):
@@ -226,9 +276,10 @@ class IsAuthenticatedOrReadOnly(permissions.BasePermission):
             return True
         return bool(request.user and request.user.is_authenticated)
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ConditionalGetMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     queryset = Comment.objects.filter(parent__isnull=True).order_by('-created_at')
     serializer_class = CommentSerializer
+    cache_models = [Comment, User]
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
@@ -277,12 +328,12 @@ class CommentViewSet(viewsets.ModelViewSet):
         """Get all replies for a comment"""
         comment = self.get_object()
         replies = comment.replies.all().order_by('created_at')
-        serializer = self.get_serializer(replies, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(replies)
 
-class DevotionViewSet(viewsets.ModelViewSet):
+class DevotionViewSet(CachedResponseMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     queryset = Devotion.objects.all().order_by('-devotion_date', '-created_at')
     serializer_class = DevotionSerializer
+    cache_models = [Devotion]
     permission_classes = [IsAdminOrReadOnly]
 
     def perform_create(self, serializer):
@@ -291,26 +342,9 @@ class DevotionViewSet(viewsets.ModelViewSet):
             # Save the devotion
             devotion = serializer.save()
             
-            # Prepare and send notification
-            title = "New Devotion Available"
-            preview = (devotion.description[:47] + '...') if len(devotion.description) > 50 else devotion.description
-            body = f"{devotion.title} - {preview}"
-            
-            data = {
-                'type': 'new_devotion',
-                'devotion_id': str(devotion.id),
-                'title': devotion.title,
-                'description': devotion.description,
-                'content_type': devotion.content_type,
-                'devotion_date': devotion.devotion_date.isoformat() if devotion.devotion_date else None,
-                'created_at': timezone.now().isoformat(),
-            }
-            
-            if devotion.content_type == 'video' and devotion.youtube_url:
-                data['youtube_url'] = devotion.youtube_url
-            
-            # Send push notification
-            send_push_notification(title, body, data)
+            # Queue pushes for the timezones where it is already the devotion's
+            # day; publish_devotions reaches the others at their local morning
+            publish_due_devotions(devotions=[devotion])
             
             return devotion
             
@@ -318,6 +352,17 @@ class DevotionViewSet(viewsets.ModelViewSet):
             logger.exception("Error creating devotion or sending notification")
             raise
 
+    def _local_today(self):
+        """Today in the caller's ``?tz=`` timezone, or in server time"""
+        try:
+            return timezone.localdate(timezone=ZoneInfo(self.request.query_params['tz']))
+        except (KeyError, ValueError, ZoneInfoNotFoundError):
+            return timezone.now().date()
+
+    def cache_key_extra(self):
+        # ``today`` results change at the caller's midnight, not on a write
+        return str(self._local_today())
+
     def get_queryset(self):
         qs = super().get_queryset()
         
@@ -333,26 +378,25 @@ class DevotionViewSet(viewsets.ModelViewSet):
         
         # Get today's devotion
         if self.request.query_params.get('today') == 'true':
-            from datetime import date as dt_date
-            qs = qs.filter(devotion_date=dt_date.today())
+            qs = qs.filter(devotion_date=self._local_today())
         
         return qs
     
     @action(detail=False, methods=['get'])
     def today(self, request):
-        """Get today's devotions (can be multiple)"""
-        today_devotions = self.queryset.filter(devotion_date=timezone.now().date())
-        serializer = self.get_serializer(today_devotions, many=True)
-        return Response(serializer.data)
+        """Get today's devotions (can be multiple), in the ``?tz=`` timezone if given"""
+        today_devotions = self.queryset.filter(devotion_date=self._local_today())
+        return self.paginated_response(today_devotions)
         today_devotions = self.queryset.filter(devotion_date=dt_date.today())
         if today_devotions.exists():
             serializer = self.get_serializer(today_devotions, many=True)
             return Response(serializer.data)
         return Response({'detail': 'No devotions for today'}, status=404)
 
-class CourseApplicationViewSet(viewsets.ModelViewSet):
+class CourseApplicationViewSet(ConditionalGetMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     queryset = CourseApplication.objects.all().order_by('-created_at')
     serializer_class = CourseApplicationSerializer
+    cache_models = [CourseApplication, User]
     
     def get_permissions(self):
         """Allow anyone to create applications, but only admins can view/update"""
@@ -459,15 +503,13 @@ class CourseApplicationViewSet(viewsets.ModelViewSet):
     def pending(self, request):
         """Get all pending applications"""
         pending_apps = self.queryset.filter(status='pending')
-        serializer = self.get_serializer(pending_apps, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(pending_apps)
     
     @action(detail=False, methods=['get'])
     def approved(self, request):
         """Get all approved applications"""
         approved_apps = self.queryset.filter(status='approved')
-        serializer = self.get_serializer(approved_apps, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(approved_apps)
         
     @action(detail=False, methods=['post'])
     def login(self, request):
@@ -1,13 +1,39 @@
 from django.contrib import admin
-from .models import DeviceToken
+from .models import DeviceSubscription, DeviceToken, PushJob
 
 @admin.register(DeviceToken)
 class DeviceTokenAdmin(admin.ModelAdmin):
-    list_display = ('token_short', 'created_at', 'last_used')
-    list_filter = ('created_at', 'last_used')
+    list_display = ('token_short', 'is_active', 'timezone', 'created_at', 'last_used')
+    list_filter = ('is_active', 'timezone', 'created_at', 'last_used')
     search_fields = ('token',)
-    readonly_fields = ('created_at', 'last_used')
+    readonly_fields = ('created_at', 'last_used', 'deactivated_at')
     
     def token_short(self, obj):
         return f"{obj.token[:15]}..." if obj.token else "-"
     token_short.short_description = 'Token (truncated)'
+
+@admin.register(DeviceSubscription)
+class DeviceSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('topic', 'device', 'created_at')
+    list_filter = ('topic',)
+    search_fields = ('topic', 'device__token')
+    raw_id_fields = ('device',)
+
+
+@admin.register(PushJob)
+class PushJobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'topic', 'timezone', 'kind', 'coalesced_count', 'status', 'attempts', 'available_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'topic', 'kind', 'created_at')
+    search_fields = ('title', 'body')
+    readonly_fields = ('attempts', 'locked_at', 'locked_by', 'result', 'last_error', 'content_hashes',
+                       'coalesced_count', 'created_at', 'updated_at', 'sent_at')
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        """Send failed or partial jobs again"""
+        from django.utils import timezone
+        count = queryset.exclude(status='processing').update(
+            status='pending', attempts=0, available_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f'{count} push job(s) queued for retry')
+    retry_jobs.short_description = 'Retry selected push jobs'
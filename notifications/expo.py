@@ -0,0 +1,336 @@
+"""
+Concurrent fan-out of push messages to Expo's Push API.
+
+Chunks of up to 100 messages (Expo's per-request limit) are encoded from a
+shared template and posted through a single, process-wide ``requests``
+session so TCP/TLS connections are reused.
+An asyncio event loop keeps a bounded window of chunks in flight; each POST
+runs on a small thread pool because ``requests`` is blocking. Request pacing
+is left to the shared adaptive limiter in ``ratelimit``.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from server import metrics
+
+from .ratelimit import get_limiter, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+# Expo API endpoints, overridable with EXPO_NOTIFICATION_CONFIG['PUSH_URL'] / ['RECEIPTS_URL']
+EXPO_API_URL = 'https://exp.host/--/api/v2/push/send'
+EXPO_RECEIPTS_URL = 'https://exp.host/--/api/v2/push/getReceipts'
+
+# Expo accepts at most 100 messages per request
+CHUNK_SIZE = 100
+
+DEFAULT_MAX_IN_FLIGHT = 6
+
+# Times a chunk is re-sent after a 429 before it is reported as failed
+THROTTLE_RETRIES = 5
+
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+chunk_latency = metrics.histogram(
+    'expo_push_chunk_duration_seconds', 'Round-trip time of each push chunk request to Expo',
+    buckets=(0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0, 2.0, 5.0, 10.0))
+tokens_counter = metrics.counter(
+    'expo_push_tokens_targeted_total', 'Messages posted to Expo, one per device token')
+chunks_counter = metrics.counter(
+    'expo_push_chunks_total', 'Push chunks sent, by outcome (ok, partial or failed)')
+retries_counter = metrics.counter(
+    'expo_push_retries_total', 'Chunk requests repeated, by reason (throttled or server_error)')
+errors_counter = metrics.counter(
+    'expo_push_errors_total', 'Push errors by class: Expo ticket error code, http_<status> or exception name')
+
+
+def get_push_url():
+    config = getattr(settings, 'EXPO_NOTIFICATION_CONFIG', {})
+    return config.get('PUSH_URL') or EXPO_API_URL
+
+
+def get_max_in_flight():
+    config = getattr(settings, 'EXPO_NOTIFICATION_CONFIG', {})
+    return max(1, int(config.get('MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT)))
+
+
+def get_session(pool_size=None):
+    """
+    Return the shared session, creating it on first use.
+
+    The connection pool is grown (never shrunk) so that it holds at least
+    ``pool_size`` connections, one per in-flight chunk.
+    """
+    global _session, _session_pool_size
+    pool_size = pool_size or get_max_in_flight()
+    if _session is None or _session_pool_size < pool_size:
+        with _session_lock:
+            if _session is None:
+                _session = requests.Session()
+            if _session_pool_size < pool_size:
+                # 429s (and their Retry-After) are left to the adaptive rate limiter
+                retry_strategy = Retry(
+                    total=3,  # Number of retries
+                    backoff_factor=1,  # Wait 1, 2, 4 seconds between retries
+                    status_forcelist=[408, 500, 502, 503, 504],
+                    allowed_methods=["POST"],  # Only retry on POST requests
+                    respect_retry_after_header=False
+                )
+                adapter = HTTPAdapter(
+                    max_retries=retry_strategy,
+                    pool_connections=pool_size,
+                    pool_maxsize=pool_size,
+                )
+                _session.mount("https://", adapter)
+                _session.mount("http://", adapter)
+                _session_pool_size = pool_size
+    return _session
+
+
+def get_headers():
+    headers = {
+        'Accept': 'application/json',
+        'Accept-encoding': 'gzip, deflate',
+        'Content-Type': 'application/json',
+        'Connection': 'keep-alive',
+    }
+
+    # Add Expo access token if available
+    if getattr(settings, 'EXPO_ACCESS_TOKEN', ''):
+        headers['Authorization'] = f'Bearer {settings.EXPO_ACCESS_TOKEN}'
+    else:
+        logger.warning("No EXPO_ACCESS_TOKEN provided. Using unauthenticated mode with lower rate limits.")
+    return headers
+
+
+def format_token(token):
+    """Ensure the token is in the ``ExponentPushToken[...]`` form"""
+    if token.startswith('ExponentPushToken') and not token.startswith('ExponentPushToken['):
+        return f"ExponentPushToken[{token.replace('ExponentPushToken', '')}]"
+    return token
+
+
+def iter_batches(items, size=CHUNK_SIZE):
+    """Yield successive lists of at most ``size`` items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_chunks(tokens, title, body, data=None, sound='default', size=CHUNK_SIZE):
+    """
+    Yield ``(tokens, payload)`` pairs ready to post to Expo.
+
+    Every message in a broadcast is identical apart from ``to``, so the
+    shared fields are JSON-encoded once and each message is spliced from the
+    encoded token and that template. Chunks are produced lazily, so only one
+    chunk's payload is held in memory at a time. Empty tokens are skipped.
+    """
+    # Prepare the notification data with platform-specific configurations
+    template = json.dumps({
+        'title': title,
+        'body': body,
+        'sound': sound,
+        'data': data or {},
+        # Android-specific configuration
+        'android': {
+            'priority': 'high',
+            'channelId': 'default'
+        },
+        # iOS-specific configuration
+        'ios': {
+            'sound': sound,
+            'badge': 1
+        }
+    }, separators=(',', ':'), cls=DjangoJSONEncoder)
+    # '{"title":...}' -> '"title":...}', to follow '{"to":"<token>",'
+    shared = ',' + template[1:]
+
+    for batch in iter_batches((format_token(token) for token in tokens if token), size):
+        payload = '[' + ','.join('{"to":' + json.dumps(token) + shared for token in batch) + ']'
+        yield batch, payload.encode()
+
+
+def parse_tickets(response_data):
+    """Return the list of push tickets in an Expo response body"""
+    if isinstance(response_data, list):
+        return response_data
+    if isinstance(response_data, dict) and isinstance(response_data.get('data'), list):
+        return response_data['data']
+    return []
+
+
+def post_chunk(session, url, headers, chunk):
+    """
+    Send one ``(tokens, payload)`` chunk and classify its tickets.
+
+    Returns a ``(success_count, errors, tickets)`` tuple where ``tickets``
+    pairs each accepted token with its Expo ticket id; never raises.
+    """
+    tokens, payload = chunk
+    success_count = 0
+    errors = []
+    tickets = []
+    limiter = get_limiter()
+    tokens_counter.inc(len(tokens))
+    try:
+        logger.info("Sending to %d tokens...", len(tokens))
+        for attempt in range(THROTTLE_RETRIES + 1):
+            if attempt:
+                retries_counter.inc(reason='throttled')
+            limiter.acquire()
+            started = time.perf_counter()
+            response = session.post(url, headers=headers, data=payload, timeout=10)
+            chunk_latency.observe(time.perf_counter() - started)
+            # 5xx responses retried inside urllib3 never reach this loop
+            retried = getattr(getattr(response.raw, 'retries', None), 'history', ())
+            if retried:
+                retries_counter.inc(len(retried), reason='server_error')
+            if response.status_code != 429:
+                break
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            logger.warning("Expo throttled a chunk of %d messages (retry after %s s)", len(tokens), retry_after)
+            limiter.on_throttle(retry_after)
+
+        if response.status_code != 200:
+            errors.append({
+                'message': f'Unexpected status code: {response.status_code}',
+                'details': response.text,
+                'status_code': response.status_code
+            })
+            errors_counter.inc(error=f'http_{response.status_code}')
+            chunks_counter.inc(outcome='failed')
+            return success_count, errors, tickets
+
+        limiter.on_success()
+        response_data = response.json() if response.content else {}
+
+        # Tickets come back in the same order as the messages
+        throttled = False
+        for token, result in zip(tokens, parse_tickets(response_data)):
+            if result.get('status') == 'error':
+                details = result.get('details') or {}
+                throttled = throttled or details.get('error') == 'MessageRateExceeded'
+                errors_counter.inc(error=details.get('error') or 'Unknown')
+                errors.append({
+                    'token': details.get('token') or token,
+                    'message': result.get('message', 'Unknown error'),
+                    'details': details
+                })
+            elif result.get('status') == 'ok':
+                success_count += 1
+                if result.get('id'):
+                    tickets.append((token, result['id']))
+        if throttled:
+            limiter.on_throttle()
+        chunks_counter.inc(outcome='partial' if errors else 'ok')
+
+    except Exception as e:
+        error_msg = f'Error sending push notification chunk: {str(e)}'
+        logger.exception(error_msg)
+        errors_counter.inc(error=type(e).__name__)
+        chunks_counter.inc(outcome='failed')
+        errors.append({
+            'message': error_msg,
+            'chunk_size': len(tokens),
+            'tokens': [token[:10] + '...' for token in tokens]  # Log first 10 chars of each token
+        })
+    return success_count, errors, tickets
+
+
+async def _fan_out(ready, url, headers, max_in_flight):
+    """
+    Yield each chunk's ``post_chunk`` result as soon as it completes.
+
+    Chunks are taken from the ``ready`` deque, which the caller refills
+    between results; the window closes once it is empty and nothing is in
+    flight.
+    """
+    session = get_session(max_in_flight)
+    loop = asyncio.get_running_loop()
+    pending = set()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='expo-push') as executor:
+        while True:
+            # Top the window up with the chunks the caller has prepared
+            while ready and len(pending) < max_in_flight:
+                chunk = ready.popleft()
+                pending.add(loop.run_in_executor(executor, post_chunk, session, url, headers, chunk))
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def send_chunks(chunks, url=None, max_in_flight=None, on_chunk=None):
+    """
+    Send push chunks to Expo with a bounded number of concurrent requests.
+
+    Args:
+        chunks (iterable): ``(tokens, payload)`` pairs as produced by
+            ``build_chunks``; consumed lazily on the calling thread, so the
+            source may stream tokens from the database.
+        url (str, optional): Push endpoint. Defaults to ``get_push_url()``.
+        max_in_flight (int, optional): Maximum concurrent chunk requests.
+            Defaults to ``EXPO_NOTIFICATION_CONFIG['MAX_IN_FLIGHT']``.
+        on_chunk (callable, optional): Called as ``on_chunk(tickets, errors)``
+            after each chunk completes. It runs outside the event loop, on the
+            calling thread, so it may use the database; the other chunks stay
+            in flight meanwhile.
+
+    Returns:
+        tuple: ``(success_count, errors)`` aggregated over every chunk.
+    """
+    max_in_flight = max_in_flight or get_max_in_flight()
+    chunks = iter(chunks)
+    ready = deque()
+    results = _fan_out(ready, url or get_push_url(), get_headers(), max_in_flight)
+    success_count = 0
+    errors = []
+
+    # Step the loop one completed chunk at a time so callbacks, and the chunk
+    # source itself, run in sync context
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            # Enough chunks to refill every slot in the window
+            while len(ready) < max_in_flight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                ready.append(chunk)
+            try:
+                chunk_success, chunk_errors, chunk_tickets = loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+            success_count += chunk_success
+            errors.extend(chunk_errors)
+            if on_chunk:
+                on_chunk(chunk_tickets, chunk_errors)
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+    return success_count, errors
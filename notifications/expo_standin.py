@@ -0,0 +1,183 @@
+"""
+Local stand-in for Expo's push endpoint, used by the push benchmarks and by
+``python manage.py run_expo_standin``.
+
+It accepts the same JSON payloads as ``/--/api/v2/push/send`` and answers
+with one ticket per message after an artificial latency (``latency`` plus up
+to ``jitter`` seconds). Most tickets are ``ok``; a fixed share of tokens
+(``ticket_error_rate``) get a ``DeviceNotRegistered`` error ticket straight
+away. A share of requests (``server_error_rate``) fail with a 500, and once
+more than ``max_rps`` requests arrive within a second the rest are answered
+with a 429 and ``Retry-After``.
+
+Receipts for issued tickets are served from ``/--/api/v2/push/getReceipts``;
+another fixed share of tokens (``unregistered_rate``) report
+``DeviceNotRegistered`` there.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ExpoStandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real endpoint
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'[]')
+
+        self.server.count_request()
+        time.sleep(self.server.get_latency())
+
+        retry_after = self.server.throttle()
+        if retry_after:
+            self.send_response(429)
+            self.send_header('Retry-After', str(retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if self.server.fail_request():
+            self._send_json(500, {'errors': [{'code': 'INTERNAL_SERVER_ERROR', 'message': 'Simulated failure'}]})
+            return
+
+        if self.path.endswith('/getReceipts'):
+            self._send_json(200, {'data': self.server.get_receipts(payload.get('ids', []))})
+            return
+
+        messages = [payload] if isinstance(payload, dict) else payload
+        self._send_json(200, {'data': [self.server.issue_ticket(message.get('to')) for message in messages]})
+
+    def _send_json(self, status_code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ExpoStandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.05, unregistered_rate=0.0, max_rps=None,
+                 jitter=0.0, ticket_error_rate=0.0, server_error_rate=0.0, seed=None):
+        super().__init__(address, ExpoStandInHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.unregistered_rate = unregistered_rate
+        self.ticket_error_rate = ticket_error_rate
+        self.server_error_rate = server_error_rate
+        self.max_rps = max_rps
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+        self.tickets = {}
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/--/api/v2/push'
+
+    @property
+    def push_url(self):
+        return f'{self.base_url}/send'
+
+    @property
+    def receipts_url(self):
+        return f'{self.base_url}/getReceipts'
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def get_latency(self):
+        if not self.jitter:
+            return self.latency
+        with self.lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def fail_request(self):
+        """Whether to answer this request with a simulated 500"""
+        if not self.server_error_rate:
+            return False
+        with self.lock:
+            failed = self._random.random() < self.server_error_rate
+            self.failed += failed
+        return failed
+
+    def throttle(self):
+        """Return a Retry-After value if this request exceeds ``max_rps``"""
+        if not self.max_rps:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            if self._window_count <= self.max_rps:
+                return None
+            self.throttled += 1
+            return 1
+
+    @staticmethod
+    def _token_share(token, salt=b''):
+        # Stable per token, so repeated runs flag the same installs
+        return zlib.crc32(salt + (token or '').encode()) % 10000 / 10000
+
+    def is_unregistered(self, token):
+        return self._token_share(token) < self.unregistered_rate
+
+    def is_rejected(self, token):
+        return self._token_share(token, b'ticket:') < self.ticket_error_rate
+
+    def issue_ticket(self, token):
+        """Return the push ticket for one message"""
+        if self.is_rejected(token):
+            return {
+                'status': 'error',
+                'message': f'"{token}" is not a registered push notification recipient',
+                'details': {'error': 'DeviceNotRegistered', 'expoPushToken': token},
+            }
+        ticket_id = str(uuid.uuid4())
+        with self.lock:
+            self.tickets[ticket_id] = token
+        return {'status': 'ok', 'id': ticket_id}
+
+    def get_receipts(self, ticket_ids):
+        receipts = {}
+        with self.lock:
+            for ticket_id in ticket_ids:
+                if ticket_id not in self.tickets:
+                    continue
+                if self.is_unregistered(self.tickets[ticket_id]):
+                    receipts[ticket_id] = {
+                        'status': 'error',
+                        'message': 'The recipient device is not registered with FCM.',
+                        'details': {'error': 'DeviceNotRegistered'},
+                    }
+                else:
+                    receipts[ticket_id] = {'status': 'ok'}
+        return receipts
+
+    def start(self):
+        """Serve on a daemon thread and return self"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
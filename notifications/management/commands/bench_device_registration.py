@@ -0,0 +1,90 @@
+import random
+import time
+from datetime import timedelta
+
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications.models import DeviceSubscription, DeviceToken
+from notifications.registration import register_tokens, touch_buffer
+from server.benchmarking import scratch_database
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+def legacy_register(token):
+    """Previous behaviour: update_or_create with an auto_now last_used"""
+    device_token, created = DeviceToken.objects.update_or_create(
+        token=token,
+        defaults={'token': token, 'is_active': True, 'deactivated_at': None, 'last_used': timezone.now()}
+    )
+    if created:
+        DeviceSubscription.objects.bulk_create(
+            [DeviceSubscription(device=device_token, topic=topic) for topic in DeviceSubscription.DEFAULT_TOPICS],
+            ignore_conflicts=True,
+        )
+
+
+class Command(BaseCommand):
+    help = 'Load-test device registration writes on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=2000,
+                            help='Distinct installs, all last seen a day ago')
+        parser.add_argument('--launches', type=int, default=20000,
+                            help='Registration calls (app launches) to simulate')
+        parser.add_argument('--batch', type=int, default=100,
+                            help='Tokens per call for the batch endpoint variant')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        devices = [f'ExponentPushToken[load-{i:06d}]' for i in range(options['devices'])]
+        launches = [rng.choice(devices) for _ in range(options['launches'])]
+
+        header = f"{'variant':<10}  {'calls':>7}  {'seconds':>8}  {'writes':>7}  {'writes/s':>9}  {'launches/s':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        with scratch_database():
+            self._seed(devices)
+            self._run('legacy', launches, lambda token: legacy_register(token))
+
+            self._seed(devices)
+            self._run('coalesced', launches, lambda token: register_tokens([token]), flush=True)
+
+            self._seed(devices)
+            batches = [launches[i:i + options['batch']] for i in range(0, len(launches), options['batch'])]
+            self._run('batch', batches, lambda tokens: register_tokens(tokens), flush=True, launches=len(launches))
+
+    def _seed(self, devices):
+        """Known installs, last seen yesterday morning"""
+        yesterday = timezone.now() - timedelta(days=1, hours=1)
+        DeviceToken.objects.all().delete()
+        DeviceToken.objects.bulk_create(
+            [DeviceToken(token=token, created_at=yesterday, last_used=yesterday) for token in devices],
+            batch_size=1000,
+        )
+
+    def _run(self, name, calls, register, flush=False, launches=None):
+        writes = 0
+
+        def count_writes(execute, sql, params, many, context):
+            nonlocal writes
+            if sql.lstrip().upper().startswith(WRITE_PREFIXES):
+                writes += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_writes):
+            started = time.perf_counter()
+            for call in calls:
+                register(call)
+            if flush:
+                touch_buffer.flush()
+            elapsed = time.perf_counter() - started
+
+        launches = launches or len(calls)
+        self.stdout.write(
+            f'{name:<10}  {len(calls):>7}  {elapsed:>8.2f}  {writes:>7}  '
+            f'{writes / elapsed:>9.0f}  {launches / elapsed:>10.0f}'
+        )
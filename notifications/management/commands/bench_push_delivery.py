@@ -0,0 +1,102 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from notifications.expo import chunk_latency
+from notifications.expo_standin import ExpoStandInServer
+from notifications.models import DeviceToken, PushTicket
+from notifications.receipts import poll_receipts
+from notifications.views import send_push_notification
+from server.benchmarking import scratch_database
+
+SEED_BATCH = 10_000
+
+
+class Command(BaseCommand):
+    help = 'Drive send_push_notification end to end against a local Expo stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, nargs='+', default=[1000, 10_000, 50_000],
+                            help='Audience sizes to benchmark')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Base stand-in response time per request, in seconds')
+        parser.add_argument('--jitter', type=float, default=0.05,
+                            help='Extra random stand-in latency, up to this many seconds')
+        parser.add_argument('--ticket-error-rate', type=float, default=0.01,
+                            help='Share of tokens rejected with a DeviceNotRegistered ticket')
+        parser.add_argument('--unregistered-rate', type=float, default=0.02,
+                            help='Share of tokens whose receipt reports DeviceNotRegistered')
+        parser.add_argument('--server-error-rate', type=float, default=0.0,
+                            help='Share of stand-in requests answered with a 500')
+        parser.add_argument('--max-rps', type=float, default=None,
+                            help='Make the stand-in answer 429 above this many requests per second')
+        parser.add_argument('--max-in-flight', type=int, default=None,
+                            help='Concurrent chunk requests (default: EXPO_NOTIFICATION_CONFIG)')
+
+    def handle(self, *args, **options):
+        server = ExpoStandInServer(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            ticket_error_rate=options['ticket_error_rate'],
+            unregistered_rate=options['unregistered_rate'],
+            server_error_rate=options['server_error_rate'],
+            max_rps=options['max_rps'],
+            seed=42,
+        ).start()
+        config = {
+            **getattr(settings, 'EXPO_NOTIFICATION_CONFIG', {}),
+            'PUSH_URL': server.push_url,
+            'RECEIPTS_URL': server.receipts_url,
+        }
+        if options['max_in_flight']:
+            config['MAX_IN_FLIGHT'] = options['max_in_flight']
+        self.stdout.write(f'Stand-in endpoint: {server.base_url}')
+
+        header = (f"{'tokens':>8}  {'seconds':>8}  {'msgs/s':>8}  {'ok':>7}  {'errors':>6}  {'p50 ms':>7}"
+                  f"  {'p99 ms':>7}  {'429s':>5}  {'500s':>5}  {'dead (ticket)':>13}  {'dead (receipt)':>14}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        try:
+            with override_settings(EXPO_NOTIFICATION_CONFIG=config), scratch_database():
+                for count in options['tokens']:
+                    self._run(server, count)
+        finally:
+            server.stop()
+
+    def _seed(self, count):
+        DeviceToken.objects.all().delete()
+        PushTicket.objects.all().delete()
+        for start in range(0, count, SEED_BATCH):
+            DeviceToken.objects.bulk_create(
+                [DeviceToken(token=f'ExponentPushToken[bench-{i:08d}]')
+                 for i in range(start, min(start + SEED_BATCH, count))],
+                batch_size=SEED_BATCH,
+            )
+
+    def _run(self, server, count):
+        self._seed(count)
+        chunk_latency.reset()
+        throttled, failed = server.throttled, server.failed
+
+        started = time.perf_counter()
+        result = send_push_notification('Benchmark', 'End-to-end push benchmark', data={'type': 'benchmark'})
+        elapsed = time.perf_counter() - started
+
+        dead_from_tickets = DeviceToken.objects.filter(is_active=False).count()
+        receipts = poll_receipts(delay=timedelta(0))
+
+        ok = result.get('success_count', 0)
+        errors = result.get('error_count', 0)
+        p50, p99 = chunk_latency.quantile(0.5), chunk_latency.quantile(0.99)
+        self.stdout.write(
+            f'{count:>8}  {elapsed:>8.2f}  {count / elapsed:>8.0f}  {ok:>7}  {errors:>6}'
+            f'  {(p50 or 0) * 1000:>7.0f}  {(p99 or 0) * 1000:>7.0f}'
+            f'  {server.throttled - throttled:>5}  {server.failed - failed:>5}'
+            f"  {dead_from_tickets:>13}  {receipts['deactivated']:>14}"
+        )
+        if ok + errors != count:
+            self.stderr.write(f'  {count - ok - errors} messages unaccounted for: {result.get("message")}')
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.expo import build_chunks, get_headers, get_session, post_chunk, send_chunks
+from notifications.expo_standin import ExpoStandInServer
+from notifications.ratelimit import get_limiter
+
+
+def build_tokens(count):
+    return [f'ExponentPushToken[bench-{i:08d}]' for i in range(count)]
+
+
+def bench_chunks(tokens):
+    return build_chunks(tokens, 'Benchmark', 'Fan-out benchmark message', data={'type': 'benchmark'})
+
+
+class Command(BaseCommand):
+    help = 'Compare sequential and concurrent Expo fan-out against a local stand-in endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, nargs='+', default=[1000, 5000, 20000, 50000],
+                            help='Audience sizes to benchmark')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Simulated Expo response time per chunk, in seconds')
+        parser.add_argument('--max-in-flight', type=int, nargs='+', default=[6, 16],
+                            help='Concurrency windows to benchmark')
+        parser.add_argument('--legacy-sleep', type=float, default=0.5,
+                            help='Per-chunk sleep of the legacy sequential sender')
+        parser.add_argument('--max-rps', type=float, default=None,
+                            help='Make the stand-in answer 429 above this many requests per second')
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help='Only benchmark the concurrent sender')
+
+    def handle(self, *args, **options):
+        server = ExpoStandInServer(latency=options['latency'], max_rps=options['max_rps']).start()
+        url = server.push_url
+        self.stdout.write(f"Stand-in endpoint: {url} (latency {options['latency'] * 1000:.0f} ms/chunk)")
+
+        header = (f"{'tokens':>8}  {'sender':<16}  {'seconds':>9}  {'msgs/s':>10}  {'ok':>8}"
+                  f"  {'limit req/s':>11}  {'throttled':>9}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        try:
+            for count in options['tokens']:
+                tokens = build_tokens(count)
+
+                if not options['skip_legacy']:
+                    elapsed, ok = self._run_legacy(tokens, url, options['legacy_sleep'])
+                    self._report(count, 'sequential', elapsed, ok)
+
+                for window in options['max_in_flight']:
+                    started = time.perf_counter()
+                    ok, _errors = send_chunks(bench_chunks(tokens), url=url, max_in_flight=window)
+                    self._report(count, f'concurrent x{window}', time.perf_counter() - started, ok)
+        finally:
+            server.stop()
+
+    def _run_legacy(self, tokens, url, sleep):
+        """Mirror the previous sender: one chunk at a time with a fixed pause"""
+        session = get_session()
+        headers = get_headers()
+        ok = 0
+        started = time.perf_counter()
+        for chunk in bench_chunks(tokens):
+            time.sleep(sleep)
+            chunk_ok, _errors, _tickets = post_chunk(session, url, headers, chunk)
+            ok += chunk_ok
+        return time.perf_counter() - started, ok
+
+    def _report(self, count, sender, elapsed, ok):
+        rate = count / elapsed if elapsed else 0
+        limiter = get_limiter().stats()
+        self.stdout.write(
+            f'{count:>8}  {sender:<16}  {elapsed:>9.2f}  {rate:>10.0f}  {ok:>8}'
+            f"  {limiter['rate']:>11.1f}  {limiter['throttle_events']:>9}"
+        )
@@ -0,0 +1,80 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from notifications.expo import CHUNK_SIZE, build_chunks
+
+TITLE = 'New Devotion Available'
+BODY = 'Walking in Faith - Today we reflect on what it means to trust in the...'
+DATA = {
+    'type': 'new_devotion',
+    'devotion_id': '42',
+    'title': 'Walking in Faith',
+    'description': 'Today we reflect on what it means to trust in the Lord with all our heart.',
+    'content_type': 'text',
+    'devotion_date': '2026-10-18',
+}
+
+
+def legacy_payloads(tokens):
+    """Previous construction: one dict per token, a rewrite pass, json per chunk"""
+    messages = [{
+        'to': token,
+        'title': TITLE,
+        'body': BODY,
+        'sound': 'default',
+        'data': DATA,
+        'android': {'priority': 'high', 'channelId': 'default'},
+        'ios': {'sound': 'default', 'badge': 1},
+    } for token in tokens]
+
+    for message in messages:
+        if message['to'].startswith('ExponentPushToken') and not message['to'].startswith('ExponentPushToken['):
+            message['to'] = f"ExponentPushToken[{message['to'].replace('ExponentPushToken', '')}]"
+
+    for i in range(0, len(messages), CHUNK_SIZE):
+        yield json.dumps(messages[i:i + CHUNK_SIZE]).encode()
+
+
+def template_payloads(tokens):
+    for _tokens, payload in build_chunks(tokens, TITLE, BODY, data=DATA):
+        yield payload
+
+
+class Command(BaseCommand):
+    help = 'Measure CPU time and peak memory of push payload construction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                            help='Audience sizes to benchmark')
+
+    def handle(self, *args, **options):
+        header = f"{'tokens':>9}  {'builder':<9}  {'cpu s':>7}  {'peak MiB':>9}  {'payload MiB':>11}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for count in options['tokens']:
+            tokens = [f'ExponentPushToken[{i:022d}]' for i in range(count)]
+            for name, builder in (('legacy', legacy_payloads), ('template', template_payloads)):
+                cpu, peak, size = self._measure(builder, tokens)
+                self.stdout.write(
+                    f'{count:>9}  {name:<9}  {cpu:>7.2f}  {peak / 2**20:>9.1f}  {size / 2**20:>11.1f}'
+                )
+
+    def _measure(self, builder, tokens):
+        # Time and memory are measured in separate passes; tracing allocations
+        # would otherwise inflate the CPU figures
+        size = 0
+        started = time.process_time()
+        for payload in builder(tokens):
+            size += len(payload)
+        cpu = time.process_time() - started
+
+        tracemalloc.start()
+        for payload in builder(tokens):
+            pass
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return cpu, peak, size
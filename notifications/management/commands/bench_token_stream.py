@@ -0,0 +1,74 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notifications.expo import build_chunks
+from notifications.models import DeviceToken
+from notifications.recipients import get_recipients, iter_tokens
+from server.benchmarking import scratch_database
+
+SEED_BATCH = 10_000
+
+
+def legacy_tokens():
+    """Previous resolution: the whole audience loaded into a list"""
+    return list(get_recipients().values_list('token', flat=True))
+
+
+def streamed_tokens():
+    return iter_tokens(get_recipients())
+
+
+class Command(BaseCommand):
+    help = 'Check that streaming a broadcast audience keeps peak memory flat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=1_000_000,
+                            help='Rows seeded into a scratch DeviceToken table')
+        parser.add_argument('--max-peak-mb', type=float, default=16.0,
+                            help='Fail if streaming the audience peaks above this many MiB')
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help='Only measure the streamed resolution')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write(f"Seeding {options['tokens']} device tokens...")
+            self._seed(options['tokens'])
+
+            header = f"{'resolution':<10}  {'tokens':>9}  {'seconds':>8}  {'peak MiB':>9}"
+            self.stdout.write(header)
+            self.stdout.write('-' * len(header))
+
+            variants = [('streamed', streamed_tokens)]
+            if not options['skip_legacy']:
+                variants.insert(0, ('legacy', legacy_tokens))
+            peaks = {}
+            for name, resolve in variants:
+                count, elapsed, peak = self._measure(resolve)
+                peaks[name] = peak
+                self.stdout.write(f'{name:<10}  {count:>9}  {elapsed:>8.2f}  {peak / 2**20:>9.1f}')
+
+        limit = options['max_peak_mb']
+        if peaks['streamed'] > limit * 2**20:
+            raise CommandError(f"Streamed resolution peaked at {peaks['streamed'] / 2**20:.1f} MiB (limit {limit} MiB)")
+
+    def _seed(self, count):
+        for start in range(0, count, SEED_BATCH):
+            DeviceToken.objects.bulk_create(
+                [DeviceToken(token=f'ExponentPushToken[{i:022d}]')
+                 for i in range(start, min(start + SEED_BATCH, count))],
+                batch_size=SEED_BATCH,
+            )
+
+    def _measure(self, resolve):
+        """Resolve the audience and build every chunk, as a broadcast would"""
+        count = 0
+        tracemalloc.start()
+        started = time.perf_counter()
+        for batch, _payload in build_chunks(resolve(), 'Title', 'Body'):
+            count += len(batch)
+        elapsed = time.perf_counter() - started
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return count, elapsed, peak
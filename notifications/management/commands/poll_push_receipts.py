@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from notifications.receipts import RECEIPT_BATCH_SIZE, RECEIPT_DELAY, audience_summary, poll_receipts
+
+
+class Command(BaseCommand):
+    help = 'Fetch Expo push receipts and deactivate tokens of unregistered devices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None,
+                            help='Receipts endpoint (default: EXPO_NOTIFICATION_CONFIG["RECEIPTS_URL"] or Expo)')
+        parser.add_argument('--batch-size', type=int, default=RECEIPT_BATCH_SIZE,
+                            help='Ticket ids per receipts request (Expo allows up to 1000)')
+        parser.add_argument('--delay-minutes', type=float, default=RECEIPT_DELAY.total_seconds() / 60,
+                            help='Only check tickets older than this many minutes')
+
+    def handle(self, *args, **options):
+        stats = poll_receipts(
+            url=options['url'],
+            batch_size=options['batch_size'],
+            delay=timedelta(minutes=options['delay_minutes']),
+        )
+        self.stdout.write(
+            f"Checked {stats['checked']} receipts: {stats['ok']} ok, {stats['errors']} errors, "
+            f"{stats['deactivated']} tokens deactivated, {stats['expired']} expired tickets dropped"
+        )
+
+        audience = audience_summary()
+        if audience['total']:
+            saved = audience['inactive'] / audience['total'] * 100
+            self.stdout.write(
+                f"Active audience: {audience['active']} of {audience['total']} tokens; "
+                f"each broadcast skips {audience['inactive']} dead installs ({saved:.1f}% less fan-out volume)"
+            )
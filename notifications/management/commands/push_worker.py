@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import get_outbox_config, get_worker_id, run_once
+from server import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued push notification jobs from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Process the due jobs and exit instead of polling')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Jobs claimed per batch (default: PUSH_OUTBOX["BATCH_SIZE"])')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--metrics-port', type=int, default=None,
+                            help='Serve this worker\'s push metrics on 127.0.0.1:PORT for scraping')
+
+    def handle(self, *args, **options):
+        config = get_outbox_config()
+        batch_size = options['batch_size'] or config['BATCH_SIZE']
+        poll_interval = options['poll_interval'] or config['POLL_INTERVAL']
+        worker_id = get_worker_id()
+
+        self.stdout.write(f'Push worker {worker_id} started (batch size {batch_size})')
+        if options['metrics_port']:
+            metrics.start_http_server(options['metrics_port'])
+            self.stdout.write(f"Serving metrics on http://127.0.0.1:{options['metrics_port']}/metrics")
+        try:
+            while True:
+                processed = run_once(batch_size, worker_id)
+                if processed:
+                    self.stdout.write(f'Processed {processed} push job(s)')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write('Push worker stopped')
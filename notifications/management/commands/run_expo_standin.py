@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from notifications.expo_standin import ExpoStandInServer
+
+
+class Command(BaseCommand):
+    help = 'Serve a local stand-in for the Expo push API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8700)
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Seconds before each response')
+        parser.add_argument('--jitter', type=float, default=0.0,
+                            help='Extra random latency, up to this many seconds')
+        parser.add_argument('--ticket-error-rate', type=float, default=0.0,
+                            help='Share of tokens given a DeviceNotRegistered error ticket')
+        parser.add_argument('--unregistered-rate', type=float, default=0.0,
+                            help='Share of tokens whose receipt reports DeviceNotRegistered')
+        parser.add_argument('--server-error-rate', type=float, default=0.0,
+                            help='Share of requests answered with a 500')
+        parser.add_argument('--max-rps', type=float, default=None,
+                            help='Answer 429 above this many requests per second')
+
+    def handle(self, *args, **options):
+        server = ExpoStandInServer(
+            address=(options['host'], options['port']),
+            latency=options['latency'],
+            jitter=options['jitter'],
+            ticket_error_rate=options['ticket_error_rate'],
+            unregistered_rate=options['unregistered_rate'],
+            server_error_rate=options['server_error_rate'],
+            max_rps=options['max_rps'],
+        )
+        self.stdout.write(f'Expo stand-in listening on {server.base_url}')
+        self.stdout.write('Point the server at it with:')
+        self.stdout.write(f'  EXPO_PUSH_URL={server.push_url} EXPO_RECEIPTS_URL={server.receipts_url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(
+                f'Stand-in stopped after {server.requests} requests '
+                f'({server.throttled} throttled, {server.failed} failed)'
+            )
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_pushjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_id', models.CharField(max_length=64, unique=True)),
+                ('token', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Push Ticket',
+                'verbose_name_plural': 'Push Tickets',
+            },
+        ),
+        migrations.AddField(
+            model_name='devicetoken',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='devicetoken',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True, help_text='Cleared when Expo reports the device as unregistered'),
+        ),
+    ]
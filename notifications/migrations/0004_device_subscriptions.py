@@ -0,0 +1,53 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+DEFAULT_TOPICS = ['devotions', 'live_stream', 'prayer_room', 'events']
+
+
+def subscribe_existing_devices(apps, schema_editor):
+    # Devices registered before topics existed keep receiving every broadcast
+    DeviceToken = apps.get_model('notifications', 'DeviceToken')
+    DeviceSubscription = apps.get_model('notifications', 'DeviceSubscription')
+    DeviceSubscription.objects.bulk_create(
+        [
+            DeviceSubscription(device_id=device_id, topic=topic)
+            for device_id in DeviceToken.objects.values_list('id', flat=True)
+            for topic in DEFAULT_TOPICS
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_push_tickets_and_token_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushjob',
+            name='topic',
+            field=models.CharField(blank=True, help_text='Only send to devices subscribed to this topic', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='DeviceSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='notifications.devicetoken')),
+            ],
+            options={
+                'verbose_name': 'Device Subscription',
+                'verbose_name_plural': 'Device Subscriptions',
+                'indexes': [models.Index(fields=['topic', 'device'], name='notificatio_topic_763cb3_idx')],
+                'unique_together': {('device', 'topic')},
+            },
+        ),
+        migrations.RunPython(subscribe_existing_devices, migrations.RunPython.noop),
+    ]
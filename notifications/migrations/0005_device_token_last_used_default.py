@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_device_subscriptions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicetoken',
+            name='last_used',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text="Refreshed at most once per DEVICE_REGISTRATION['TOUCH_INTERVAL']"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_device_token_last_used_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushjob',
+            name='coalesced_count',
+            field=models.PositiveIntegerField(default=1, help_text='Notifications summarised by this job'),
+        ),
+        migrations.AddField(
+            model_name='pushjob',
+            name='content_hashes',
+            field=models.JSONField(blank=True, default=list, help_text='Hashes of the payloads folded into this job'),
+        ),
+        migrations.AddField(
+            model_name='pushjob',
+            name='kind',
+            field=models.CharField(blank=True, help_text="Notification type (data['type']), used for coalescing", max_length=50),
+        ),
+    ]
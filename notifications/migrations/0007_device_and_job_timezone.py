@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_push_job_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicetoken',
+            name='timezone',
+            field=models.CharField(blank=True, db_index=True, help_text="IANA name reported by the app, e.g. Africa/Douala; blank means DEVICE_REGISTRATION['DEFAULT_TIMEZONE']", max_length=64),
+        ),
+        migrations.AddField(
+            model_name='pushjob',
+            name='timezone',
+            field=models.CharField(blank=True, help_text='Only send to devices in this timezone bucket', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_device_and_job_timezone'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pushjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('sent', 'Sent'), ('partial', 'Partially sent'), ('skipped', 'Skipped (no recipients)'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+    ]
@@ -4,7 +4,10 @@ from django.utils import timezone
 class DeviceToken(models.Model):
     token = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(default=timezone.now)
-    last_used = models.DateTimeField(auto_now=True)
+    last_used = models.DateTimeField(default=timezone.now, help_text="Refreshed at most once per DEVICE_REGISTRATION['TOUCH_INTERVAL']")
+    is_active = models.BooleanField(default=True, db_index=True, help_text="Cleared when Expo reports the device as unregistered")
+    deactivated_at = models.DateTimeField(null=True, blank=True)
+    timezone = models.CharField(max_length=64, blank=True, db_index=True, help_text="IANA name reported by the app, e.g. Africa/Douala; blank means DEVICE_REGISTRATION['DEFAULT_TIMEZONE']")
 
     def __str__(self):
         return f"Device Token: {self.token[:10]}..."
@@ -12,3 +15,115 @@ class DeviceToken(models.Model):
     class Meta:
         verbose_name = "Device Token"
         verbose_name_plural = "Device Tokens"
+
+
+class DeviceSubscription(models.Model):
+    """Topic a device has opted into; targeted pushes only reach subscribers"""
+    TOPIC_DEVOTIONS = 'devotions'
+    TOPIC_LIVE_STREAM = 'live_stream'
+    TOPIC_PRAYER_ROOM = 'prayer_room'
+    TOPIC_EVENTS = 'events'
+    COURSE_TOPIC_PREFIX = 'course_'
+
+    # Topics a device gets when it registers without choosing any
+    DEFAULT_TOPICS = [TOPIC_DEVOTIONS, TOPIC_LIVE_STREAM, TOPIC_PRAYER_ROOM, TOPIC_EVENTS]
+
+    device = models.ForeignKey(DeviceToken, on_delete=models.CASCADE, related_name='subscriptions')
+    topic = models.CharField(max_length=100)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.topic}: {self.device.token[:10]}..."
+
+    @classmethod
+    def course_topic(cls, course_id):
+        return f"{cls.COURSE_TOPIC_PREFIX}{course_id}"
+
+    @classmethod
+    def is_valid_topic(cls, topic):
+        if topic in cls.DEFAULT_TOPICS:
+            return True
+        suffix = topic[len(cls.COURSE_TOPIC_PREFIX):] if topic.startswith(cls.COURSE_TOPIC_PREFIX) else ''
+        return suffix.isdigit()
+
+    class Meta:
+        unique_together = [['device', 'topic']]
+        indexes = [
+            # Recipient lookup: topic -> devices
+            models.Index(fields=['topic', 'device']),
+        ]
+        verbose_name = "Device Subscription"
+        verbose_name_plural = "Device Subscriptions"
+
+
+class PushJob(models.Model):
+    """
+    Outbox entry for a push notification broadcast.
+
+    Jobs are written from the request path and delivered by the
+    ``push_worker`` management command.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('sent', 'Sent'),
+        ('partial', 'Partially sent'),
+        ('skipped', 'Skipped (no recipients)'),
+        ('failed', 'Failed'),
+    ]
+
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    sound = models.CharField(max_length=50, default='default')
+    tokens = models.JSONField(null=True, blank=True, help_text="Explicit recipients; empty means all devices")
+    topic = models.CharField(max_length=100, blank=True, help_text="Only send to devices subscribed to this topic")
+
+    kind = models.CharField(max_length=50, blank=True, help_text="Notification type (data['type']), used for coalescing")
+    content_hashes = models.JSONField(default=list, blank=True, help_text="Hashes of the payloads folded into this job")
+    coalesced_count = models.PositiveIntegerField(default=1, help_text="Notifications summarised by this job")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the job may be sent")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    # Declared last: the name shadows django.utils.timezone in the class body
+    timezone = models.CharField(max_length=64, blank=True, help_text="Only send to devices in this timezone bucket")
+
+    def __str__(self):
+        return f"{self.title} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['available_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+        verbose_name = "Push Job"
+        verbose_name_plural = "Push Jobs"
+
+
+class PushTicket(models.Model):
+    """
+    Expo push ticket awaiting its delivery receipt.
+
+    Rows are removed by the ``poll_push_receipts`` command once the receipt
+    has been processed or has expired.
+    """
+    ticket_id = models.CharField(max_length=64, unique=True)
+    token = models.CharField(max_length=255)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Push Ticket: {self.ticket_id}"
+
+    class Meta:
+        verbose_name = "Push Ticket"
+        verbose_name_plural = "Push Tickets"
@@ -0,0 +1,298 @@
+"""
+Durable outbox for push notification broadcasts.
+
+The request path only records a ``PushJob``; the ``push_worker`` management
+command claims pending jobs in batches, delivers them with
+``send_push_notification`` and retries failures with exponential backoff.
+
+Before a job is written, a payload identical to one queued within
+``DEDUP_WINDOW`` is dropped, and broadcasts whose ``data['type']`` has a
+``COALESCE`` rule are held for the rule's window so that later ones of the
+same type fold into a single summary push.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import PushJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_CONFIG = {
+    'BATCH_SIZE': 10,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BASE_DELAY': 30,  # seconds, doubled on every attempt
+    'RETRY_MAX_DELAY': 3600,
+    'LEASE_TIMEOUT': 900,  # processing jobs not renewed for this long are reclaimed
+    'POLL_INTERVAL': 5,
+    'DEDUP_WINDOW': 600,  # seconds an identical payload is suppressed for
+    'DEDUP_IGNORE_KEYS': ['created_at'],  # data keys that differ between re-saves
+    'COALESCE': {
+        'new_devotion': {
+            'WINDOW': 120,  # seconds the first push is held for more to join
+            'TITLE': 'New Devotions Available',
+            'BODY': '{count} new devotions available',
+        },
+    },
+}
+
+
+def get_outbox_config():
+    return {**DEFAULT_OUTBOX_CONFIG, **getattr(settings, 'PUSH_OUTBOX', {})}
+
+
+def content_hash(title, body, data=None, tokens=None, sound='default', topic=None, tz=None):
+    """Stable hash of a notification payload, ignoring ``DEDUP_IGNORE_KEYS`` in ``data``"""
+    ignored = set(get_outbox_config()['DEDUP_IGNORE_KEYS'])
+    payload = {
+        'title': title,
+        'body': body,
+        'data': {key: value for key, value in (data or {}).items() if key not in ignored},
+        'tokens': sorted(tokens) if tokens else None,
+        'sound': sound,
+        'topic': topic or '',
+        'timezone': tz or '',
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def is_duplicate(digest):
+    """Whether a payload with this hash was queued within ``DEDUP_WINDOW``"""
+    window = get_outbox_config()['DEDUP_WINDOW']
+    if not window:
+        return False
+    recent = PushJob.objects.filter(
+        updated_at__gte=timezone.now() - timedelta(seconds=window)
+    ).exclude(status='failed')
+    # Only a handful of jobs fall inside the window, so scan their hashes here
+    # rather than relying on JSON containment lookups SQLite lacks
+    return any(digest in (hashes or []) for hashes in recent.values_list('content_hashes', flat=True))
+
+
+def coalesce_into_pending(kind, rule, title, body, data, sound, topic, tz, digest):
+    """
+    Fold a broadcast into a pending job of the same kind and audience.
+
+    Returns the updated job, or ``None`` when there is nothing to join.
+    """
+    with transaction.atomic():
+        pending = PushJob.objects.filter(
+            kind=kind, topic=topic or '', timezone=tz or '', sound=sound, tokens__isnull=True,
+            status='pending', attempts=0,
+        )
+        if connection.features.has_select_for_update:
+            pending = pending.select_for_update()
+        job = pending.order_by('-created_at').first()
+        if job is None:
+            return None
+
+        job.coalesced_count += 1
+        job.title = rule['TITLE']
+        job.body = rule['BODY'].format(count=job.coalesced_count)
+        # The latest item's data, so a tap still opens something specific
+        job.data = {**(data or {}), 'count': job.coalesced_count}
+        job.content_hashes = [*job.content_hashes, digest]
+        # A worker may have claimed the job since it was read
+        updated = PushJob.objects.filter(id=job.id, status='pending').update(
+            title=job.title, body=job.body, data=job.data, content_hashes=job.content_hashes,
+            coalesced_count=job.coalesced_count, updated_at=timezone.now(),
+        )
+    return job if updated else None
+
+
+def enqueue_push_notification(title, body, data=None, tokens=None, sound='default', topic=None, tz=None):
+    """
+    Queue a push notification for the worker once the current transaction commits.
+
+    Takes the same arguments as ``send_push_notification``. Duplicates of a
+    recently queued payload are dropped, and topic broadcasts covered by a
+    ``COALESCE`` rule may be merged into a summary push.
+    """
+    def create_job():
+        digest = content_hash(title, body, data, tokens, sound, topic, tz)
+        if is_duplicate(digest):
+            logger.info("Dropped duplicate push notification: %s", title)
+            return
+
+        config = get_outbox_config()
+        kind = str((data or {}).get('type', ''))
+        rule = config['COALESCE'].get(kind) if kind and not tokens else None
+        if rule:
+            job = coalesce_into_pending(kind, rule, title, body, data, sound, topic, tz, digest)
+            if job is not None:
+                logger.info("Coalesced push into job %s (%d notifications)", job.id, job.coalesced_count)
+                return
+
+        job = PushJob.objects.create(
+            title=title,
+            body=body,
+            data=data or {},
+            tokens=list(tokens) if tokens else None,
+            sound=sound,
+            topic=topic or '',
+            timezone=tz or '',
+            kind=kind,
+            content_hashes=[digest],
+            available_at=timezone.now() + timedelta(seconds=rule['WINDOW'] if rule else 0),
+        )
+        logger.info("Queued push job %s: %s", job.id, title)
+
+    transaction.on_commit(create_job)
+
+
+def get_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def release_stale_jobs():
+    """Return jobs whose worker died mid-delivery to the pending queue"""
+    cutoff = timezone.now() - timedelta(seconds=get_outbox_config()['LEASE_TIMEOUT'])
+    released = PushJob.objects.filter(status='processing', locked_at__lt=cutoff).update(
+        status='pending', locked_at=None, locked_by=''
+    )
+    if released:
+        logger.warning("Released %d stale push jobs", released)
+    return released
+
+
+class LeaseLost(Exception):
+    """The job was reclaimed by another worker while this one was sending it"""
+
+
+def renew_lease(job):
+    """
+    Extend this worker's claim on ``job``.
+
+    Raises:
+        LeaseLost: The job's lease ran out and another worker may be sending it.
+    """
+    renewed = PushJob.objects.filter(id=job.id, status='processing', locked_by=job.locked_by).update(
+        locked_at=timezone.now()
+    )
+    if not renewed:
+        raise LeaseLost(f"Push job {job.id} is no longer held by {job.locked_by}")
+
+
+def lease_keeper(job):
+    """
+    An ``on_chunk`` callback that renews ``job``'s lease while it is sent, at
+    most every tenth of ``LEASE_TIMEOUT``.
+    """
+    interval = get_outbox_config()['LEASE_TIMEOUT'] / 10
+    renewed_at = [time.monotonic()]
+
+    def on_chunk(tickets, errors):
+        if time.monotonic() - renewed_at[0] >= interval:
+            renew_lease(job)
+            renewed_at[0] = time.monotonic()
+
+    return on_chunk
+
+
+def claim_jobs(batch_size, worker_id):
+    """Atomically mark up to ``batch_size`` due jobs as processing and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = PushJob.objects.filter(status='pending', available_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        # The status guard keeps two workers from claiming the same row on
+        # backends without SKIP LOCKED
+        PushJob.objects.filter(id__in=ids, status='pending').update(
+            status='processing', locked_at=now, locked_by=worker_id
+        )
+    return list(PushJob.objects.filter(id__in=ids, status='processing', locked_by=worker_id))
+
+
+def retry_delay(attempts):
+    config = get_outbox_config()
+    return min(config['RETRY_BASE_DELAY'] * 2 ** max(attempts - 1, 0), config['RETRY_MAX_DELAY'])
+
+
+def process_job(job):
+    """Deliver a claimed job and record the outcome on it"""
+    from .views import send_push_notification
+
+    job.attempts += 1
+    try:
+        result = send_push_notification(
+            title=job.title,
+            body=job.body,
+            data=job.data,
+            tokens=job.tokens,
+            sound=job.sound,
+            topic=job.topic or None,
+            tz=job.timezone or None,
+            # A large broadcast can outlast LEASE_TIMEOUT; keep other workers off it
+            on_chunk=lease_keeper(job),
+        )
+        error = None
+    except Exception as e:
+        logger.exception("Push job %s raised", job.id)
+        result = None
+        error = str(e)
+
+    status = (result or {}).get('status')
+    # A chunk-level failure that reached nobody is retried; per-token errors
+    # are not, since a resend would duplicate the devices that succeeded
+    if status == 'success' or (status == 'partial' and result.get('success_count')):
+        job.status = 'sent' if status == 'success' else 'partial'
+        job.sent_at = timezone.now()
+        job.last_error = ''
+    elif (result or {}).get('reason') == 'no_recipients':
+        # An empty topic or timezone audience stays empty on a retry
+        job.status = 'skipped'
+        job.last_error = result['message']
+        logger.info("Push job %s skipped: %s", job.id, result['message'])
+    else:
+        error = error or (result or {}).get('message', 'No notifications delivered')
+        job.last_error = error
+        if job.attempts >= get_outbox_config()['MAX_ATTEMPTS']:
+            job.status = 'failed'
+            logger.error("Push job %s failed after %d attempts: %s", job.id, job.attempts, error)
+        else:
+            job.status = 'pending'
+            job.available_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            logger.warning("Push job %s attempt %d failed, retrying at %s: %s",
+                           job.id, job.attempts, job.available_at, error)
+
+    job.result = result
+    owner = job.locked_by
+    job.locked_at = None
+    job.locked_by = ''
+    job.updated_at = timezone.now()
+    fields = ['attempts', 'status', 'sent_at', 'last_error', 'available_at',
+              'result', 'locked_at', 'locked_by', 'updated_at']
+    # Only while this worker still holds the job; if it was reclaimed, the
+    # new holder records its own outcome
+    owned = PushJob.objects.filter(id=job.id, status='processing', locked_by=owner).update(
+        **{field: getattr(job, field) for field in fields}
+    )
+    if not owned:
+        logger.warning("Push job %s was reclaimed by another worker; outcome not recorded", job.id)
+    return job
+
+
+def run_once(batch_size=None, worker_id=None):
+    """Claim and deliver one batch of jobs; returns how many were processed"""
+    batch_size = batch_size or get_outbox_config()['BATCH_SIZE']
+    worker_id = worker_id or get_worker_id()
+    release_stale_jobs()
+    jobs = claim_jobs(batch_size, worker_id)
+    for job in jobs:
+        process_job(job)
+    return len(jobs)
@@ -0,0 +1,136 @@
+"""
+Adaptive token-bucket limiter for requests to Expo's Push API.
+
+One limiter is shared by every send in the process. Much like TCP
+congestion control, the rate grows quickly until Expo first pushes back,
+then only by about ``RATE_LIMIT_INCREASE`` requests per second each second.
+Every 429 (or ``MessageRateExceeded`` ticket) halves it, and a
+``Retry-After`` header pauses all senders until it has elapsed.
+"""
+import email.utils
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from server import metrics
+
+DEFAULT_RATE_LIMIT_CONFIG = {
+    'RATE_LIMIT_INITIAL': 6.0,  # chunk requests per second (~600 messages/s)
+    'RATE_LIMIT_MIN': 0.5,
+    'RATE_LIMIT_MAX': 50.0,
+    'RATE_LIMIT_INCREASE': 1.0,
+    'RATE_LIMIT_BURST': 6,
+}
+
+rate_gauge = metrics.gauge(
+    'expo_push_rate_limit_requests_per_second', 'Current Expo push request rate allowed by the limiter')
+throttle_counter = metrics.counter(
+    'expo_push_throttle_events_total', 'Throttling responses (429 or MessageRateExceeded) received from Expo')
+wait_counter = metrics.counter(
+    'expo_push_throttle_wait_seconds_total', 'Time senders spent waiting on the rate limiter')
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds encoded by a ``Retry-After`` header, if any"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - timezone.now()).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate, min_rate, max_rate, increase, burst):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.burst = max(1, burst)
+        self.rate = min(max(rate, min_rate), max_rate)
+        # Below this rate, grow fast; set to half the rate at the last throttle
+        self.threshold = max_rate
+        self.throttle_events = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        rate_gauge.set(self.rate)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+        if waited:
+            wait_counter.inc(waited)
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.threshold:
+                self.rate += self.increase
+            else:
+                # One increase per rate's worth of requests, i.e. per second
+                self.rate += self.increase / self.rate
+            self.rate = min(self.max_rate, self.rate)
+            rate_gauge.set(self.rate)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.threshold = self.rate
+            self.throttle_events += 1
+            # Drain the bucket so the reduced rate applies immediately
+            self._tokens = 0.0
+            self._updated = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            rate_gauge.set(self.rate)
+        throttle_counter.inc()
+
+    def stats(self):
+        with self._lock:
+            return {'rate': round(self.rate, 2), 'throttle_events': self.throttle_events}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the process-wide limiter, creating it from settings on first use"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                config = {**DEFAULT_RATE_LIMIT_CONFIG, **getattr(settings, 'EXPO_NOTIFICATION_CONFIG', {})}
+                _limiter = AdaptiveRateLimiter(
+                    rate=float(config['RATE_LIMIT_INITIAL']),
+                    min_rate=float(config['RATE_LIMIT_MIN']),
+                    max_rate=float(config['RATE_LIMIT_MAX']),
+                    increase=float(config['RATE_LIMIT_INCREASE']),
+                    burst=int(config['RATE_LIMIT_BURST']),
+                )
+    return _limiter
@@ -0,0 +1,130 @@
+"""
+Expo push receipt polling and dead-token pruning.
+
+Every accepted push returns a ticket id. Expo publishes the delivery receipt
+for it some minutes later; receipts carrying a permanent error such as
+``DeviceNotRegistered`` mean the install is gone, so its token is marked
+inactive and skipped by future broadcasts.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .expo import EXPO_RECEIPTS_URL, get_headers, get_session
+from .models import DeviceToken, PushTicket
+
+logger = logging.getLogger(__name__)
+
+# Expo accepts at most 1000 ticket ids per receipts request
+RECEIPT_BATCH_SIZE = 1000
+
+# Receipts are usually ready within 15 minutes and kept for a day
+RECEIPT_DELAY = timedelta(minutes=15)
+RECEIPT_TTL = timedelta(hours=24)
+
+# Ticket and receipt errors after which a token will never work again
+PERMANENT_ERRORS = {'DeviceNotRegistered'}
+
+
+def get_receipts_url():
+    config = getattr(settings, 'EXPO_NOTIFICATION_CONFIG', {})
+    return config.get('RECEIPTS_URL') or EXPO_RECEIPTS_URL
+
+
+def is_permanent_error(details):
+    return isinstance(details, dict) and details.get('error') in PERMANENT_ERRORS
+
+
+def record_tickets(tickets):
+    """Persist ``(token, ticket_id)`` pairs returned by a push chunk"""
+    if tickets:
+        PushTicket.objects.bulk_create(
+            [PushTicket(token=token, ticket_id=ticket_id) for token, ticket_id in tickets],
+            ignore_conflicts=True,
+        )
+
+
+def deactivate_tokens(tokens):
+    """Mark tokens inactive so fan-out skips them; returns how many changed"""
+    if not tokens:
+        return 0
+    count = DeviceToken.objects.filter(token__in=set(tokens), is_active=True).update(
+        is_active=False, deactivated_at=timezone.now()
+    )
+    if count:
+        logger.info("Deactivated %d unregistered device tokens", count)
+    return count
+
+
+def fetch_receipts(ticket_ids, url=None):
+    """Return the receipts Expo has for ``ticket_ids``, or None if the request failed"""
+    try:
+        response = get_session().post(
+            url or get_receipts_url(),
+            headers=get_headers(),
+            json={'ids': ticket_ids},
+            timeout=10,
+        )
+        response.raise_for_status()
+        return (response.json() or {}).get('data') or {}
+    except Exception:
+        logger.exception("Error fetching push receipts for %d tickets", len(ticket_ids))
+        return None
+
+
+def poll_receipts(url=None, batch_size=RECEIPT_BATCH_SIZE, delay=RECEIPT_DELAY):
+    """
+    Check receipts for tickets older than ``delay`` and deactivate dead tokens.
+
+    Processed and expired tickets are deleted; tickets whose receipt is not
+    ready yet are left for the next run.
+
+    Returns:
+        dict: Counts of checked, ok, error, deactivated and expired tickets.
+    """
+    now = timezone.now()
+    expired, _ = PushTicket.objects.filter(created_at__lt=now - RECEIPT_TTL).delete()
+    stats = {'checked': 0, 'ok': 0, 'errors': 0, 'deactivated': 0, 'expired': expired}
+
+    due = PushTicket.objects.filter(created_at__lte=now - delay).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(due.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        receipts = fetch_receipts([ticket.ticket_id for ticket in batch], url)
+        if receipts is None:
+            break
+
+        done = []
+        dead_tokens = []
+        for ticket in batch:
+            receipt = receipts.get(ticket.ticket_id)
+            if receipt is None:
+                continue
+            done.append(ticket.id)
+            if receipt.get('status') == 'ok':
+                stats['ok'] += 1
+            else:
+                stats['errors'] += 1
+                if is_permanent_error(receipt.get('details')):
+                    dead_tokens.append(ticket.token)
+                else:
+                    logger.warning("Push receipt %s error: %s", ticket.ticket_id, receipt.get('message'))
+
+        stats['checked'] += len(done)
+        stats['deactivated'] += deactivate_tokens(dead_tokens)
+        PushTicket.objects.filter(id__in=done).delete()
+
+    return stats
+
+
+def audience_summary():
+    """Return active and inactive token counts"""
+    active = DeviceToken.objects.filter(is_active=True).count()
+    inactive = DeviceToken.objects.filter(is_active=False).count()
+    return {'active': active, 'inactive': inactive, 'total': active + inactive}
@@ -0,0 +1,61 @@
+"""
+Broadcast audience resolution.
+
+Broadcasts may reach the whole ``DeviceToken`` table, so recipients are
+streamed in primary-key order one page at a time instead of being loaded
+into a list. Each page starts after the last id of the previous one
+(keyset pagination), which stays cheap however deep the table goes and is
+not disturbed by tokens being deactivated mid-broadcast.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import DeviceToken
+from .registration import get_registration_config
+
+# Tokens fetched per query while streaming a broadcast audience
+RECIPIENT_BATCH_SIZE = 2000
+
+
+def get_recipient_batch_size():
+    config = getattr(settings, 'EXPO_NOTIFICATION_CONFIG', {})
+    return max(1, int(config.get('RECIPIENT_BATCH_SIZE', RECIPIENT_BATCH_SIZE)))
+
+
+def get_recipients(topic=None, tz=None):
+    """
+    Active devices, optionally only those subscribed to ``topic`` and in the
+    ``tz`` timezone bucket. Devices without a timezone belong to the
+    ``DEFAULT_TIMEZONE`` bucket.
+    """
+    recipients = DeviceToken.objects.filter(is_active=True)
+    if topic:
+        recipients = recipients.filter(subscriptions__topic=topic)
+    if tz:
+        if tz == get_registration_config()['DEFAULT_TIMEZONE']:
+            recipients = recipients.filter(Q(timezone=tz) | Q(timezone=''))
+        else:
+            recipients = recipients.filter(timezone=tz)
+    return recipients
+
+
+def get_timezone_buckets(topic=None):
+    """Every timezone bucket with at least one active device (subscribed to ``topic``)"""
+    default = get_registration_config()['DEFAULT_TIMEZONE']
+    zones = get_recipients(topic).order_by().values_list('timezone', flat=True).distinct()
+    return sorted({zone or default for zone in zones})
+
+
+def iter_tokens(queryset, batch_size=None):
+    """Yield the ``token`` of every row in ``queryset``, one keyset page at a time"""
+    batch_size = batch_size or get_recipient_batch_size()
+    last_id = 0
+    while True:
+        page = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'token')[:batch_size]
+        )
+        for _, token in page:
+            yield token
+        if len(page) < batch_size:
+            return
+        last_id = page[-1][0]
@@ -0,0 +1,151 @@
+"""
+Write-coalesced device token registration.
+
+Apps call ``register-device/`` on every launch. Most of those calls are for
+a known, active token whose ``last_used`` is recent, so they are answered
+from a single read. Stale ``last_used`` values are not written per request
+but buffered and flushed in bulk with one UPDATE.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import DeviceSubscription, DeviceToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRATION_CONFIG = {
+    'TOUCH_INTERVAL': 24 * 3600,  # seconds before last_used is refreshed
+    'FLUSH_SIZE': 500,  # buffered touches that trigger a flush
+    'FLUSH_INTERVAL': 30,  # seconds between flushes
+    'MAX_BATCH_TOKENS': 1000,  # tokens accepted by register-devices/
+    'DEFAULT_TIMEZONE': 'Africa/Douala',  # bucket for devices that never reported one
+}
+
+
+def get_registration_config():
+    return {**DEFAULT_REGISTRATION_CONFIG, **getattr(settings, 'DEVICE_REGISTRATION', {})}
+
+
+class TouchBuffer:
+    """Process-wide buffer of tokens whose ``last_used`` needs refreshing"""
+
+    def __init__(self):
+        self._tokens = set()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def add(self, tokens):
+        config = get_registration_config()
+        with self._lock:
+            self._tokens.update(tokens)
+            due = (len(self._tokens) >= config['FLUSH_SIZE']
+                   or time.monotonic() - self._last_flush >= config['FLUSH_INTERVAL'])
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered touch with one UPDATE; returns rows updated"""
+        with self._lock:
+            tokens, self._tokens = self._tokens, set()
+            self._last_flush = time.monotonic()
+        if not tokens:
+            return 0
+        try:
+            return DeviceToken.objects.filter(token__in=tokens).update(last_used=timezone.now())
+        except Exception:
+            logger.exception("Error flushing %d device token touches", len(tokens))
+            return 0
+
+
+touch_buffer = TouchBuffer()
+atexit.register(touch_buffer.flush)
+
+
+def sync_topics(device_ids, topics):
+    """Make each device's subscriptions equal ``topics``, writing only the differences"""
+    current = {}
+    for device_id, topic in DeviceSubscription.objects.filter(device_id__in=device_ids).values_list('device_id', 'topic'):
+        current.setdefault(device_id, set()).add(topic)
+
+    wanted = set(topics)
+    stale = [device_id for device_id in device_ids if current.get(device_id, set()) - wanted]
+    if stale:
+        DeviceSubscription.objects.filter(device_id__in=stale).exclude(topic__in=wanted).delete()
+    missing = [
+        DeviceSubscription(device_id=device_id, topic=topic)
+        for device_id in device_ids
+        for topic in wanted - current.get(device_id, set())
+    ]
+    if missing:
+        DeviceSubscription.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def register_tokens(tokens, topics=None, tz=None):
+    """
+    Register or refresh a set of device tokens.
+
+    New tokens are inserted in bulk, deactivated tokens are reactivated
+    right away, and active tokens only have ``last_used`` refreshed (through
+    the touch buffer) once it is older than ``TOUCH_INTERVAL``.
+
+    Args:
+        tokens (list): Expo push tokens.
+        topics (list, optional): Replace the subscriptions of every token.
+            New tokens get ``DeviceSubscription.DEFAULT_TOPICS`` when omitted.
+        tz (str, optional): IANA timezone of the devices; only written
+            where it differs from the stored one.
+
+    Returns:
+        dict: ``created``, ``reactivated``, ``touched`` and ``unchanged``
+        token lists, and ``ids`` mapping every token to its row id.
+    """
+    tokens = list(dict.fromkeys(token for token in tokens if token))
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=get_registration_config()['TOUCH_INTERVAL'])
+
+    existing = {
+        row['token']: row
+        for row in DeviceToken.objects.filter(token__in=tokens).values('id', 'token', 'is_active', 'last_used', 'timezone')
+    }
+    created = [token for token in tokens if token not in existing]
+    reactivated = [token for token, row in existing.items() if not row['is_active']]
+    touched = [token for token, row in existing.items() if row['is_active'] and row['last_used'] < stale_before]
+    unchanged = [token for token, row in existing.items() if row['is_active'] and row['last_used'] >= stale_before]
+
+    ids = {token: row['id'] for token, row in existing.items()}
+    if created:
+        DeviceToken.objects.bulk_create(
+            [DeviceToken(token=token, created_at=now, last_used=now, timezone=tz or '') for token in created],
+            ignore_conflicts=True,
+        )
+        ids.update(DeviceToken.objects.filter(token__in=created).values_list('token', 'id'))
+    if reactivated:
+        DeviceToken.objects.filter(token__in=reactivated).update(is_active=True, deactivated_at=None, last_used=now)
+    if touched:
+        touch_buffer.add(touched)
+    if tz:
+        moved = [token for token, row in existing.items() if row['timezone'] != tz]
+        if moved:
+            DeviceToken.objects.filter(token__in=moved).update(timezone=tz)
+
+    if topics is not None:
+        sync_topics([ids[token] for token in tokens if token in ids], topics)
+    elif created:
+        sync_topics([ids[token] for token in created if token in ids], DeviceSubscription.DEFAULT_TOPICS)
+
+    return {
+        'created': created,
+        'reactivated': reactivated,
+        'touched': touched,
+        'unchanged': unchanged,
+        'ids': ids,
+    }
@@ -1,10 +1,80 @@
+from zoneinfo import available_timezones
+
 from rest_framework import serializers
-from .models import DeviceToken
+from .models import DeviceSubscription, DeviceToken
+
+_TIMEZONES = None
+
+
+def validate_topic_list(value):
+    invalid = [topic for topic in value if not DeviceSubscription.is_valid_topic(topic)]
+    if invalid:
+        raise serializers.ValidationError(f"Unknown topics: {', '.join(invalid)}")
+    return list(dict.fromkeys(value))
+
+
+def validate_timezone_name(value):
+    global _TIMEZONES
+    if _TIMEZONES is None:
+        _TIMEZONES = available_timezones()
+    if value and value not in _TIMEZONES:
+        raise serializers.ValidationError(f"Unknown timezone: {value}")
+    return value
+
 
 class DeviceTokenSerializer(serializers.ModelSerializer):
+    topics = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        help_text="Topics to subscribe to; replaces the current subscriptions"
+    )
+    timezone = serializers.CharField(
+        max_length=64,
+        required=False,
+        allow_blank=True,
+        help_text="IANA timezone of the device, e.g. America/New_York"
+    )
+
     class Meta:
         model = DeviceToken
-        fields = ['token']
+        fields = ['token', 'topics', 'timezone']
         extra_kwargs = {
             'token': {'validators': []}  # Disable unique validation to handle it in the view
         }
+
+    def validate_topics(self, value):
+        return validate_topic_list(value)
+
+    def validate_timezone(self, value):
+        return validate_timezone_name(value)
+
+
+class DeviceTokenBatchSerializer(serializers.Serializer):
+    tokens = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False
+    )
+    topics = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        required=False,
+        help_text="Topics to subscribe every token to; replaces the current subscriptions"
+    )
+    timezone = serializers.CharField(
+        max_length=64,
+        required=False,
+        allow_blank=True,
+        help_text="IANA timezone shared by every token"
+    )
+
+    def validate_tokens(self, value):
+        from .registration import get_registration_config
+        limit = get_registration_config()['MAX_BATCH_TOKENS']
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} tokens can be registered per request.")
+        return value
+
+    def validate_topics(self, value):
+        return validate_topic_list(value)
+
+    def validate_timezone(self, value):
+        return validate_timezone_name(value)
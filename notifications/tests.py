@@ -1,3 +1,44 @@
+import os
+import tracemalloc
+
 from django.test import TestCase
 
-# Create your tests here.
+from .expo import build_chunks
+from .models import DeviceToken
+from .recipients import get_recipients, iter_tokens
+
+SEED_BATCH = 10_000
+
+
+class TokenStreamMemoryTests(TestCase):
+    """
+    Broadcasting to the whole DeviceToken table must not load it into memory.
+
+    TOKEN_STREAM_TEST_ROWS sets the table size (default 1,000,000) and
+    TOKEN_STREAM_MAX_PEAK_MB the ceiling (default 16).
+    """
+    rows = int(os.environ.get('TOKEN_STREAM_TEST_ROWS', 1_000_000))
+    max_peak = float(os.environ.get('TOKEN_STREAM_MAX_PEAK_MB', 16)) * 2**20
+
+    @classmethod
+    def setUpTestData(cls):
+        for start in range(0, cls.rows, SEED_BATCH):
+            DeviceToken.objects.bulk_create(
+                [DeviceToken(token=f'ExponentPushToken[{i:022d}]')
+                 for i in range(start, min(start + SEED_BATCH, cls.rows))],
+                batch_size=SEED_BATCH,
+            )
+
+    def test_streamed_broadcast_stays_under_memory_ceiling(self):
+        sent = 0
+        tracemalloc.start()
+        try:
+            for batch, _payload in build_chunks(iter_tokens(get_recipients()), 'Title', 'Body'):
+                sent += len(batch)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(sent, self.rows)
+        self.assertLess(peak, self.max_peak,
+                        f'Streaming {self.rows} tokens peaked at {peak / 2**20:.1f} MiB')
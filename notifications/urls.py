@@ -3,5 +3,7 @@ from . import views
 
 urlpatterns = [
     path('register-device/', views.register_device_token, name='register-device'),
+    path('register-devices/', views.register_device_tokens, name='register-devices'),
     path('test-notification/', views.test_notification, name='test-notification'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
@@ -1,33 +1,44 @@
-import json
+import hmac
+import itertools
 import logging
-import requests
 import time
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from collections import Counter
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from .models import DeviceToken
-from .serializers import DeviceTokenSerializer
+from server import metrics
+from .expo import build_chunks, send_chunks
+from .models import DeviceSubscription, DeviceToken
+from .receipts import deactivate_tokens, is_permanent_error, record_tickets
+from .recipients import get_recipients, iter_tokens
+from .registration import register_tokens
+from .serializers import DeviceTokenBatchSerializer, DeviceTokenSerializer
+
+broadcast_duration = metrics.histogram(
+    'expo_push_broadcast_duration_seconds', 'Wall time of send_push_notification, by result status',
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+broadcasts_counter = metrics.counter(
+    'expo_push_broadcasts_total', 'send_push_notification calls, by result status (success, partial or error)')
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def test_notification(request):
     """
-    Test endpoint to send a push notification to all registered devices
+    Test endpoint to send a push notification to all registered devices,
+    or only to the subscribers of ``?topic=``
     """
     from django.http import JsonResponse
     from django.conf import settings
     
-    # Get all device tokens
-    tokens = list(DeviceToken.objects.values_list('token', flat=True))
-    
-    if not tokens:
+    # Check there is someone to notify; the tokens are streamed when sending
+    topic = request.query_params.get('topic')
+    if not get_recipients(topic).exists():
         return JsonResponse(
             {'status': 'error', 'message': 'No device tokens found'},
             status=400
@@ -47,7 +58,7 @@ def test_notification(request):
         title=title,
         body=body,
         data=data,
-        tokens=tokens
+        topic=topic
     )
     
     return JsonResponse({
@@ -58,43 +69,42 @@ def test_notification(request):
 
 # Set up logging
 logger = logging.getLogger(__name__)
+# Per-launch registration events; sampled by LOGGING['filters']['sample_info']
+registration_logger = logging.getLogger(__name__ + '.registration')
 
-# Expo API endpoint
-EXPO_API_URL = 'https://exp.host/--/api/v2/push/send'
+def _mask_token(token):
+    """Enough of a push token to correlate log lines without logging the credential"""
+    return f"{token[:22]}...{token[-4:]}" if len(token) > 30 else f"{token[:8]}..."
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_device_token(request):
     """
-    Register a new device token or update the last_used timestamp if it exists
+    Register a new device token, or refresh its last_used timestamp once it has gone stale
     """
-    logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] Received device token registration request")
-    
     try:
         serializer = DeviceTokenSerializer(data=request.data)
         
         if not serializer.is_valid():
-            logger.error(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] Invalid token data: {serializer.errors}")
+            registration_logger.warning("Invalid token data: %s", serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         token = serializer.validated_data['token']
-        logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] Received device token: {token}")
-        
-        # Create or update the device token
-        device_token, created = DeviceToken.objects.update_or_create(
-            token=token,
-            defaults={'token': token}
-        )
+        topics = serializer.validated_data.get('topics')
+        # Create the device token, or refresh it if it has gone stale
+        registration = register_tokens([token], topics, serializer.validated_data.get('timezone'))
+        created = token in registration['created']
         
         action = "registered" if created else "updated"
-        logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] Successfully {action} token with ID: {device_token.id}")
+        registration_logger.info("Device token %s %s (id %s)", _mask_token(token), action, registration['ids'].get(token))
         
         return Response(
             {
                 'status': 'success', 
                 'message': f'Device token {action.lower()} successfully',
                 'created': created,
-                'token_id': str(device_token.id)
+                'token_id': str(registration['ids'].get(token)),
+                'topics': topics if topics is not None else (DeviceSubscription.DEFAULT_TOPICS if created else None)
             },
             status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
         )
@@ -106,7 +116,65 @@ def register_device_token(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-def send_push_notification(title, body, data=None, tokens=None, sound='default'):
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def register_device_tokens(request):
+    """
+    Register many device tokens in one call
+    """
+    serializer = DeviceTokenBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        registration = register_tokens(
+            serializer.validated_data['tokens'],
+            serializer.validated_data.get('topics'),
+            serializer.validated_data.get('timezone')
+        )
+    except Exception:
+        logger.exception("[NOTIFICATION] Error in register_device_tokens")
+        return Response(
+            {'status': 'error', 'message': 'Internal server error'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    created = len(registration['created'])
+    return Response(
+        {
+            'status': 'success',
+            'created': created,
+            'updated': len(registration['reactivated']) + len(registration['touched']),
+            'unchanged': len(registration['unchanged']),
+        },
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+    )
+
+def _peek(iterable):
+    """Return the first item (or None) and an iterator that still yields it"""
+    iterator = iter(iterable)
+    first = next(iterator, None)
+    if first is None:
+        return None, iterator
+    return first, itertools.chain([first], iterator)
+
+class _ErrorSummary:
+    """Counts of push errors by message, built only if the log line is emitted"""
+
+    def __init__(self, errors):
+        self.errors = errors
+
+    def __str__(self):
+        counts = Counter(err.get('message', 'Unknown error') for err in self.errors)
+        return '; '.join(f"{message} x{count}" for message, count in counts.most_common(5))
+
+def _handle_chunk_tickets(tickets, errors):
+    """Keep ticket ids for receipt polling and drop tokens Expo already rejected"""
+    record_tickets(tickets)
+    deactivate_tokens([err['token'] for err in errors if err.get('token') and is_permanent_error(err.get('details'))])
+
+def send_push_notification(title, body, data=None, tokens=None, sound='default', topic=None, tz=None,
+                           on_chunk=None):
     """
     Send push notifications to multiple devices using Expo's Push Notification service
     
@@ -116,163 +184,66 @@ def send_push_notification(title, body, data=None, tokens=None, sound='default')
         data (dict, optional): Additional data to send. Defaults to None.
         tokens (list, optional): List of Expo push tokens. If None, sends to all registered devices.
         sound (str, optional): Sound to play when the notification is received. Defaults to 'default'.
+        topic (str, optional): When no tokens are given, only send to devices subscribed to this topic.
+        tz (str, optional): When no tokens are given, only send to devices in this timezone bucket.
+        on_chunk (callable, optional): Also called as ``on_chunk(tickets, errors)`` after each chunk
+            is sent; an exception it raises stops the send.
     
     Returns:
         dict: Status of the operation with details
     """
-    logger = logging.getLogger(__name__)
-    
+    started = time.perf_counter()
+    result = _deliver_push_notification(title, body, data, tokens, sound, topic, tz, on_chunk)
+    outcome = result.get('status', 'error')
+    broadcast_duration.observe(time.perf_counter() - started, status=outcome)
+    broadcasts_counter.inc(status=outcome)
+    return result
+
+def _deliver_push_notification(title, body, data, tokens, sound, topic, tz, on_chunk=None):
     # Log the notification being sent
     if data and 'devotion_id' in data:
-        logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] New devotion created: ID {data['devotion_id']}, Title: \"{data.get('title', 'No title')}\"")
-    
-    if not tokens:
-        # Get all active device tokens if none provided
-        tokens = list(DeviceToken.objects.values_list('token', flat=True))
-        logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] No tokens provided, using all {len(tokens)} registered tokens")
+        logger.info('Sending devotion %s: "%s"', data['devotion_id'], data.get('title', 'No title'))
     
     if not tokens:
-        return {'status': 'error', 'message': 'No device tokens available'}
-    
-    # Filter out any empty or None tokens
-    valid_tokens = [token for token in tokens if token]
-    if not valid_tokens:
-        error_msg = 'No valid device tokens available'
-        logger.error(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] {error_msg}")
-        return {'status': 'error', 'message': error_msg}
-        
-    logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] Found {len(valid_tokens)} valid device tokens to notify")
-    
-    # Prepare the notification data with platform-specific configurations
-    messages = [{
-        'to': token,
-        'title': title,
-        'body': body,
-        'sound': sound,
-        'data': data or {},
-        # Android-specific configuration
-        'android': {
-            'priority': 'high',
-            'channelId': 'default'
-        },
-        # iOS-specific configuration
-        'ios': {
-            'sound': sound,
-            'badge': 1
-        }
-    } for token in valid_tokens]
-    
-    # Configure retry strategy
-    retry_strategy = Retry(
-        total=3,  # Number of retries
-        backoff_factor=1,  # Wait 1, 2, 4 seconds between retries
-        status_forcelist=[408, 429, 500, 502, 503, 504],  # Retry on these status codes
-        allowed_methods=["POST"]  # Only retry on POST requests
-    )
-    
-    # Create a session with retry strategy
-    session = requests.Session()
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("https://", adapter)
-    
-    # Set up headers
-    headers = {
-        'Accept': 'application/json',
-        'Accept-encoding': 'gzip, deflate',
-        'Content-Type': 'application/json',
-        'Connection': 'keep-alive',
-    }
-    
-    # Add Expo access token if available
-    if hasattr(settings, 'EXPO_ACCESS_TOKEN') and settings.EXPO_ACCESS_TOKEN:
-        headers['Authorization'] = f'Bearer {settings.EXPO_ACCESS_TOKEN}'
+        # Stream all active device tokens if none provided, a page at a time
+        first, valid_tokens = _peek(iter_tokens(get_recipients(topic, tz)))
+        if first is None:
+            return {'status': 'error', 'message': 'No device tokens available', 'reason': 'no_recipients'}
+        logger.info("No tokens provided, streaming registered tokens (topic %s, timezone %s)", topic or 'any', tz or 'any')
     else:
-        logger.warning("No EXPO_ACCESS_TOKEN provided. Using unauthenticated mode with lower rate limits.")
-    
-    # For Android, ensure we're using the correct format
-    for message in messages:
-        if 'to' in message and message['to']:
-            # Ensure the token is in the correct format
-            if message['to'].startswith('ExponentPushToken') and not message['to'].startswith('ExponentPushToken['):
-                message['to'] = f"ExponentPushToken[{message['to'].replace('ExponentPushToken', '')}]"
-    
-    success_count = 0
-    errors = []
-    
-    try:
-        # Send the notifications in chunks of 100 (Expo's limit)
-        chunk_size = 100
+        # Skip tokens Expo has reported as unregistered
+        inactive = set(DeviceToken.objects.filter(token__in=tokens, is_active=False).values_list('token', flat=True))
+        tokens = [token for token in tokens if token not in inactive]
+        
+        if not tokens:
+            return {'status': 'error', 'message': 'No device tokens available', 'reason': 'no_recipients'}
         
-        for i in range(0, len(messages), chunk_size):
-            chunk = messages[i:i + chunk_size]
+        # Filter out any empty or None tokens
+        valid_tokens = [token for token in tokens if token]
+        if not valid_tokens:
+            error_msg = 'No valid device tokens available'
+            logger.error(error_msg)
+            return {'status': 'error', 'message': error_msg, 'reason': 'no_recipients'}
             
-            try:
-                logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] Sending to {len(chunk)} tokens...")
-                
-                # Add a small delay between chunks to avoid rate limiting
-                time.sleep(0.5)
-                
-                # Use the session with retries
-                response = session.post(
-                    EXPO_API_URL,
-                    headers=headers,
-                    json=chunk,
-                    timeout=10  # 10 seconds timeout
-                )
-                response_data = response.json() if response.content else {}
-                
-                if response.status_code == 200:
-                    logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] Expo response: {json.dumps(response_data, indent=2)}")
-                    if isinstance(response_data, list):
-                        for result in response_data:
-                            if result.get('status') == 'error':
-                                errors.append({
-                                    'token': result.get('details', {}).get('token'),
-                                    'message': result.get('message', 'Unknown error'),
-                                    'details': result.get('details')
-                                })
-                            elif result.get('status') == 'ok':
-                                success_count += 1
-                    elif isinstance(response_data, dict) and 'data' in response_data and isinstance(response_data['data'], list):
-                        for result in response_data['data']:
-                            if result.get('status') == 'error':
-                                errors.append({
-                                    'token': result.get('details', {}).get('token'),
-                                    'message': result.get('message', 'Unknown error'),
-                                    'details': result.get('details')
-                                })
-                            elif result.get('status') == 'ok':
-                                success_count += 1
-                else:
-                    errors.append({
-                        'message': f'Unexpected status code: {response.status_code}',
-                        'details': response.text,
-                        'status_code': response.status_code
-                    })
-                    
-            except Exception as e:
-                error_msg = f'Error sending push notification chunk: {str(e)}'
-                logger.exception(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] {error_msg}")
-                errors.append({
-                    'message': error_msg,
-                    'chunk_size': len(chunk),
-                    'tokens': [msg['to'][:10] + '...' for msg in chunk]  # Log first 10 chars of each token
-                })
+        logger.info("Found %d valid device tokens to notify", len(valid_tokens))
+    
+    try:
+        # Send the notifications in chunks of 100 (Expo's limit), several chunks at a time
+        chunks = build_chunks(valid_tokens, title, body, data=data, sound=sound)
+        def handle_chunk(tickets, errors):
+            _handle_chunk_tickets(tickets, errors)
+            if on_chunk:
+                on_chunk(tickets, errors)
+
+        success_count, errors = send_chunks(chunks, on_chunk=handle_chunk)
         
         # Log final results
         if data and 'devotion_id' in data:
             if success_count > 0:
-                logger.info(f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] Successfully sent notification for devotion {data['devotion_id']} to {success_count} devices")
+                logger.info("Sent notification for devotion %s to %d devices", data['devotion_id'], success_count)
             if errors:
-                error_details = '\n'.join([
-                    f"Error {i+1}: {err.get('message')} (Token: {err.get('details', {}).get('token', 'unknown')})"
-                    for i, err in enumerate(errors)
-                ])
-                logger.warning(
-                    f"[{timezone.now().strftime('%Y-%m-%d %H:%M:%S')}] "
-                    f"Failed to send {len(errors)} notifications for devotion {data['devotion_id']}\n"
-                    f"Error details:\n{error_details}"
-                )
+                logger.warning("Failed to send %d notifications for devotion %s: %s",
+                               len(errors), data['devotion_id'], _ErrorSummary(errors))
         
         # Prepare the response
         result = {
@@ -298,3 +269,17 @@ def send_push_notification(title, body, data=None, tokens=None, sound='default')
             'message': f'Failed to send notifications: {str(e)}',
             'errors': [{'message': str(e)}]
         }
+
+@require_GET
+def metrics_view(request):
+    """
+    Push delivery metrics of this process in the Prometheus text format.
+
+    Scrapers authenticate with ``Authorization: Bearer <METRICS_TOKEN>``;
+    logged-in staff may also view the page.
+    """
+    expected = getattr(settings, 'METRICS_TOKEN', '')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not (expected and hmac.compare_digest(supplied, expected)) and not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
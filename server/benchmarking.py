@@ -0,0 +1,19 @@
+"""Helpers shared by the bench_* management commands of every app"""
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def scratch_database():
+    """
+    Run the body against a throwaway test database.
+
+    Benchmarks seed and write many rows; this keeps them away from the
+    configured database.
+    """
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
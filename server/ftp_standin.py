@@ -0,0 +1,85 @@
+"""
+Local FTP server for exercising ``FTPStorage`` without the production host.
+
+Built on pyftpdlib, which is only needed for the tests and the storage
+benchmarks and is not a runtime dependency (``requirements-dev.txt``). Every command is
+answered after ``latency`` seconds, and so is the greeting, to model the
+round trip to a remote host. With ``drop_after`` set, the control and data
+connections are cut once an upload has received that many bytes, the way a
+flaky link drops a long transfer.
+"""
+import threading
+import time
+
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import DTPHandler, FTPHandler
+from pyftpdlib.servers import ThreadedFTPServer
+
+USERNAME = 'bench'
+PASSWORD = 'bench'
+
+
+class SlowFTPHandler(FTPHandler):
+    latency = 0.0
+
+    def on_connect(self):
+        time.sleep(self.latency)
+
+    def pre_process_command(self, line, cmd, arg):
+        self.server.count_command(cmd)
+        time.sleep(self.latency)
+        return super().pre_process_command(line, cmd, arg)
+
+
+class DroppingDTPHandler(DTPHandler):
+    drop_after = None
+
+    def handle_read(self):
+        super().handle_read()
+        if self.drop_after and self.receive and self.tot_bytes_received >= self.drop_after:
+            self.file_obj.flush()
+            self.cmd_channel.server.count_drop()
+            self.cmd_channel.close()
+
+    handle_read_event = handle_read  # the base class aliases its own handle_read
+
+
+class FTPStandInServer(ThreadedFTPServer):
+    def __init__(self, root, address=('127.0.0.1', 0), latency=0.0, drop_after=None):
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(USERNAME, PASSWORD, str(root), perm='elradfmwMT')
+        handler = type('Handler', (SlowFTPHandler,), {'authorizer': authorizer, 'latency': latency})
+        handler.dtp_handler = type('DTPHandler', (DroppingDTPHandler,), {'drop_after': drop_after})
+        super().__init__(address, handler)
+        self.commands = {}
+        self.drops = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    def count_command(self, cmd):
+        with self.lock:
+            self.commands[cmd] = self.commands.get(cmd, 0) + 1
+
+    def count_drop(self):
+        with self.lock:
+            self.drops += 1
+
+    def reset_counts(self):
+        with self.lock:
+            self.commands = {}
+            self.drops = 0
+
+    @property
+    def storage_options(self):
+        """Keyword arguments pointing ``FTPStorage`` at this server"""
+        host, port = self.address[:2]
+        return {'host': host, 'port': port, 'username': USERNAME, 'password': PASSWORD, 'base_path': '/'}
+
+    def start(self):
+        """Serve on a daemon thread and return self"""
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'handle_exit': False}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.close_all()
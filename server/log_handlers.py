@@ -0,0 +1,138 @@
+"""
+Logging handlers and filters referenced from ``LOGGING`` in settings.
+
+``QueuedJsonFileHandler`` keeps file I/O off the request thread. Callers
+only put records on an in-memory queue, and a ``QueueListener`` thread
+formats them as JSON lines into a size-rotated file. Each process (every
+gunicorn worker, ``push_worker``, other management commands) writes and
+rotates a file of its own, ``app.<pid>.jsonl``, since rotation is not safe
+across processes. ``SamplingFilter`` drops a configurable share of
+high-volume INFO records before they are queued.
+"""
+import atexit
+import json
+import logging
+import os
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from queue import SimpleQueue
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, logger, message and traceback"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a share of INFO and DEBUG records from the given loggers.
+
+    ``rates`` maps a logger name (and its children) to the share of records
+    kept, between 0 and 1. The most specific name wins. WARNING and above are
+    never dropped.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        # Longest names first, so children override their parents
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def rate_for(self, name):
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + '.'):
+                return rate
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class QueuedJsonFileHandler(QueueHandler):
+    """
+    Queue records for a background thread that writes rotating JSON-lines.
+
+    The listener thread is started on the first record a process emits, not
+    when ``LOGGING`` is configured, so a process forked after configuration
+    (gunicorn ``--preload``) starts its own thread and file.
+
+    Args:
+        filename (str): Log file; the process id is inserted before the
+            suffix (``app.jsonl`` -> ``app.1234.jsonl``). Its directory is
+            created if missing.
+        max_bytes (int): Size at which the file is rotated.
+        backup_count (int): Rotated files kept (``app.1234.jsonl.1`` ...).
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5):
+        super().__init__(SimpleQueue())
+        self.filename = Path(filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.listener = None
+        self._pid = None
+        # Flush what is still queued when the process exits
+        atexit.register(self.close)
+
+    def filename_for(self, pid):
+        return self.filename.with_name(f'{self.filename.stem}.{pid}{self.filename.suffix}')
+
+    def _start_listener(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        # A forked child inherits the parent's queue and a listener whose
+        # thread did not survive the fork; both are left to the parent
+        self.queue = SimpleQueue()
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        target = RotatingFileHandler(
+            self.filename_for(pid), maxBytes=self.max_bytes, backupCount=self.backup_count,
+            encoding='utf-8', delay=True,
+        )
+        target.setFormatter(JsonLinesFormatter())
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+        self._pid = pid
+
+    def emit(self, record):
+        # handle() holds self.lock here, which logging re-creates after fork
+        self._start_listener()
+        super().emit(record)
+
+    def prepare(self, record):
+        # Resolve the message and traceback on the calling thread, since args
+        # may be mutated or unpicklable later; the listener only serialises
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        # Only the process that started the listener can stop it
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+        self.listener = self._pid = None
+        super().close()
@@ -0,0 +1,166 @@
+"""
+Local read-through cache for media fetched from the FTP host.
+
+``DiskLRUCache`` keeps recently read files under a local directory, bounded
+by total bytes and evicted least recently used first. Each cached copy
+carries the remote file's modification time as its own mtime, so a copy is
+only used while its size and mtime still match the remote metadata, and that
+check holds across restarts and between processes sharing the directory.
+
+The directory itself is the shared index: a hit stamps the copy's atime, and
+every process re-reads sizes and access times from disk at least every
+``sync_interval`` seconds before evicting. The byte bound therefore holds for
+the directory as a whole, give or take what other processes add between two
+syncs.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from server import metrics
+
+logger = logging.getLogger(__name__)
+
+requests_counter = metrics.counter(
+    'media_cache_requests_total', 'Media reads through the local cache, by result (hit, miss or stale)')
+bytes_gauge = metrics.gauge(
+    'media_cache_bytes', 'Bytes of media held in the local read cache')
+
+
+class DiskLRUCache:
+    """
+    Args:
+        root (str): Cache directory, created if missing.
+        max_bytes (int): Total size kept in the directory; older files are
+            evicted past it.
+        sync_interval (int): Seconds between re-reads of the directory.
+        stale_tmp_after (int): Seconds without a write after which a
+            temporary file counts as abandoned (its writer died) and is
+            removed; live downloads write far more often than that.
+    """
+
+    def __init__(self, root, max_bytes, sync_interval=30, stale_tmp_after=600):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self.sync_interval = sync_interval
+        self.stale_tmp_after = stale_tmp_after
+        self._entries = OrderedDict()  # name -> size, least recently used first
+        self._bytes = 0
+        self._synced_at = None
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._sync()
+        self._evict()
+
+    def _sync(self):
+        """Index what is on disk, from every process, oldest access first"""
+        found = []
+        now = time.time()
+        for directory, _dirs, files in os.walk(self.root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                    if filename.endswith('.tmp'):
+                        if now - stat.st_mtime > self.stale_tmp_after:
+                            os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue  # Renamed into place or evicted meanwhile
+                found.append((stat.st_atime, os.path.relpath(path, self.root).replace(os.sep, '/'), stat.st_size))
+        entries = OrderedDict((name, size) for _atime, name, size in sorted(found))
+        with self._lock:
+            self._entries = entries
+            self._bytes = sum(entries.values())
+            self._synced_at = time.monotonic()
+
+    def path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def get(self, name, size, modified):
+        """
+        Path of the cached copy of ``name``, or None.
+
+        ``size`` and ``modified`` (a timestamp) are the remote file's; a copy
+        that no longer matches them is dropped.
+        """
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            requests_counter.inc(result='miss')
+            return None
+        if stat.st_size != size or int(stat.st_mtime) != int(modified):
+            requests_counter.inc(result='stale')
+            self.discard(name)
+            return None
+        try:
+            # Record the access where other processes' syncs see it
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        except FileNotFoundError:
+            pass  # Evicted by another process; the caller falls back to a download
+        with self._lock:
+            if name not in self._entries:
+                self._bytes += size
+            self._entries[name] = size
+            self._entries.move_to_end(name)
+        requests_counter.inc(result='hit')
+        return path
+
+    def put(self, name, modified, write):
+        """
+        Fill the cache for ``name`` by calling ``write(file)`` and return its path.
+
+        The copy is written under a temporary name and renamed into place, so
+        readers never see a partial file.
+        """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+        try:
+            with open(partial, 'wb') as f:
+                write(f)
+            os.utime(partial, (time.time(), modified))  # atime is the last access, mtime the remote's
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        size = os.path.getsize(path)
+        if time.monotonic() - self._synced_at > self.sync_interval:
+            self._sync()  # Picks up the new copy too
+        else:
+            with self._lock:
+                self._bytes += size - self._entries.get(name, 0)
+                self._entries[name] = size
+                self._entries.move_to_end(name)
+        self._evict()
+        return path
+
+    def discard(self, name):
+        with self._lock:
+            self._bytes -= self._entries.pop(name, 0)
+            bytes_gauge.set(self._bytes)
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        evicted = []
+        with self._lock:
+            while self._bytes > self.max_bytes and self._entries:
+                name, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                evicted.append(name)
+            bytes_gauge.set(self._bytes)
+        for name in evicted:
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            logger.debug("Evicted %s file(s) from the media cache", len(evicted))
@@ -0,0 +1,200 @@
+"""
+Process-local metrics registry.
+
+Counters, gauges and histograms are kept in memory per worker process and
+are safe to update from any thread. Metric names follow Prometheus conventions
+(``*_total`` for counters, base units in the name), and ``render_text``
+produces the Prometheus text exposition format for scraping.
+"""
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        """Return ``(labels, value)`` pairs"""
+        with self._lock:
+            return [(dict(key), value) for key, value in self._values.items()]
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(Metric):
+    """
+    Cumulative bucket counts, as in Prometheus.
+
+    A sample's value is a ``{'buckets', 'sum', 'count'}`` dict where
+    ``buckets`` lists ``(upper_bound, cumulative_count)`` pairs ending in
+    ``+Inf``.
+    """
+    type = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+    def __init__(self, name, documentation, buckets=None):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def _snapshot(self, counts, total):
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative.append((bound, running))
+        return {'buckets': cumulative, 'sum': total, 'count': running}
+
+    def samples(self):
+        with self._lock:
+            return [(dict(key), self._snapshot(list(counts), total)) for key, (counts, total) in self._values.items()]
+
+    def value(self, **labels):
+        with self._lock:
+            counts, total = self._values.get(_label_key(labels), ([0] * len(self.buckets), 0.0))
+            return self._snapshot(list(counts), total)
+
+    def quantile(self, q, **labels):
+        """Estimate the ``q`` quantile by linear interpolation within buckets"""
+        snapshot = self.value(**labels)
+        if not snapshot['count']:
+            return None
+        rank = q * snapshot['count']
+        lower_bound, lower_count = 0.0, 0
+        for bound, count in snapshot['buckets']:
+            if count >= rank:
+                if bound == float('inf'):
+                    return lower_bound
+                if count == lower_count:
+                    return bound
+                return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+            lower_bound, lower_count = bound, count
+        return lower_bound
+
+
+def _get_or_create(cls, name, documentation, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, documentation, **kwargs)
+        return metric
+
+
+def counter(name, documentation=''):
+    return _get_or_create(Counter, name, documentation)
+
+
+def gauge(name, documentation=''):
+    return _get_or_create(Gauge, name, documentation)
+
+
+def histogram(name, documentation='', buckets=None):
+    return _get_or_create(Histogram, name, documentation, buckets=buckets)
+
+
+def all_metrics():
+    with _registry_lock:
+        return list(_registry.values())
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in sorted(labels.items())
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render_text():
+    """Every registered metric in the Prometheus text format (version 0.0.4)"""
+    lines = []
+    for metric in sorted(all_metrics(), key=lambda metric: metric.name):
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for labels, value in metric.samples():
+            if metric.type != 'histogram':
+                lines.append(f'{metric.name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            for bound, count in value['buckets']:
+                bucket_labels = {**labels, 'le': _format_value(float(bound))}
+                lines.append(f'{metric.name}_bucket{_format_labels(bucket_labels)} {count}')
+            lines.append(f'{metric.name}_sum{_format_labels(labels)} {_format_value(value["sum"])}')
+            lines.append(f'{metric.name}_count{_format_labels(labels)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = render_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_http_server(port, host='127.0.0.1'):
+    """
+    Serve ``render_text`` on a daemon thread, for processes without a web
+    server of their own (e.g. ``push_worker``). Returns the server.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -10,19 +10,52 @@ import cloudinary.api
 # Paths
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Basic logging configuration
+# Logging: WARNING and above to the console; app INFO events to rotating
+# JSON-lines files, written from a background thread (server/log_handlers.py).
+# Each process writes its own logs/app.<pid>.jsonl.
+LOG_DIR = Path(os.environ.get('LOG_DIR', BASE_DIR / 'logs'))
+# Share of INFO events kept from per-request / per-chunk loggers
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.1))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'sample_info': {
+            '()': 'server.log_handlers.SamplingFilter',
+            'rates': {
+                'notifications.expo': LOG_SAMPLE_RATE,  # one line per chunk
+                'notifications.views.registration': LOG_SAMPLE_RATE,  # one line per app launch
+            },
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
+            'level': 'WARNING',
+        },
+        'json_file': {
+            '()': 'server.log_handlers.QueuedJsonFileHandler',
+            'filename': str(LOG_DIR / 'app.jsonl'),
+            'max_bytes': 10 * 1024 * 1024,
+            'backup_count': 5,
+            'filters': ['sample_info'],
         },
     },
     'root': {
         'handlers': ['console'],
         'level': 'WARNING',
     },
+    'loggers': {
+        'api': {
+            'handlers': ['json_file'],
+            'level': os.environ.get('LOG_LEVEL', 'INFO'),
+        },
+        'notifications': {
+            'handlers': ['json_file'],
+            'level': os.environ.get('LOG_LEVEL', 'INFO'),
+        },
+    },
 }
 
 
@@ -139,6 +172,14 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Cursor pages on list endpoints; ?paginate=false returns the whole list (api/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetCursorPagination',
+}
+
+API_PAGINATION = {
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 20)),
+    'MAX_PAGE_SIZE': 100,
+    'PAGINATE_BY_DEFAULT': os.environ.get('API_PAGINATE_BY_DEFAULT', '1') == '1',
 }
 
 # JWT Settings
@@ -163,6 +204,31 @@ CORS_ALLOWED_ORIGINS = [
     'https://b99e3c29.ark-of-god-admin-new.pages.dev'
 ]
 
+# Shared cache for API responses and the model version counters that key them
+# (api/caching.py). Redis when REDIS_URL is set (needs the redis package),
+# otherwise files under CACHE_DIR, shared by the workers on one host.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+
+API_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('API_RESPONSE_CACHE', '1') == '1',
+    'TIMEOUT': 300,
+}
+
 # Storage Backend: FTP
 STORAGES = {
     "default": {
@@ -180,6 +246,19 @@ FTP_STORAGE_OPTIONS = {
     "base_path": "/",
     "port": 21,
     "passive": True,
+    # Persistent connections per process (server/storage_backends.py)
+    "pool_size": int(os.environ.get("FTP_POOL_SIZE", 4)),
+    # Separate connections for streamed request bodies, which hold one for
+    # as long as the client takes to send the file
+    "stream_pool_size": int(os.environ.get("FTP_STREAM_POOL_SIZE", 4)),
+    "keepalive_interval": 30,  # idle seconds before a NOOP health check
+    "max_idle": 300,  # idle seconds before a connection is replaced
+    # Write uploads under MEDIA_ROOT/staged and return straight away; run
+    # `manage.py ship_staged_uploads --loop` to move them to the FTP host
+    "staged": os.environ.get("FTP_STAGED_UPLOADS", "0") == "1",
+    # Local LRU copies of media read back through the storage, under MEDIA_ROOT/cache;
+    # the bound is for the directory, shared by every worker on the host
+    "read_cache_bytes": int(os.environ.get("FTP_READ_CACHE_MB", 512)) * 1024 * 1024,
 }
 # Media (uploads)
 MEDIA_URL = "https://st60307.ispot.cc/nostress/"
@@ -188,6 +267,9 @@ MEDIA_ROOT = BASE_DIR / "media"
 # Expo Push Notifications Configuration
 EXPO_ACCESS_TOKEN = os.environ.get('EXPO_ACCESS_TOKEN', '')
 
+# Bearer token for scraping /api/notifications/metrics/ (staff can view it when logged in)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # FCM Configuration for Android push notifications
 FCM_SERVER_KEY = os.environ.get('FCM_SERVER_KEY', '')
 
@@ -197,4 +279,67 @@ EXPO_NOTIFICATION_CONFIG = {
     'DEFAULT_CHANNEL_ID': 'default',
     'DEFAULT_SOUND': 'default',
     'DEFAULT_BADGE': 1,
-}
\ No newline at end of file
+    # Point these at a stand-in (`python manage.py run_expo_standin`) to test without exp.host
+    'PUSH_URL': os.environ.get('EXPO_PUSH_URL', ''),
+    'RECEIPTS_URL': os.environ.get('EXPO_RECEIPTS_URL', ''),
+    # Number of 100-message chunks posted to Expo concurrently
+    'MAX_IN_FLIGHT': int(os.environ.get('EXPO_PUSH_MAX_IN_FLIGHT', 6)),
+    # Device tokens read per query while streaming a broadcast audience
+    'RECIPIENT_BATCH_SIZE': 2000,
+    # Adaptive limiter, in chunk requests (up to 100 messages) per second.
+    # Halved on every 429, then raised by about RATE_LIMIT_INCREASE each second.
+    'RATE_LIMIT_INITIAL': float(os.environ.get('EXPO_PUSH_RATE_LIMIT', 6)),
+    'RATE_LIMIT_MIN': 0.5,
+    'RATE_LIMIT_MAX': float(os.environ.get('EXPO_PUSH_RATE_LIMIT_MAX', 50)),
+    'RATE_LIMIT_INCREASE': 1.0,
+    'RATE_LIMIT_BURST': 6,
+}
+
+# Push notification outbox, drained by `python manage.py push_worker`
+PUSH_OUTBOX = {
+    'BATCH_SIZE': 10,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BASE_DELAY': 30,  # seconds, doubled on every attempt
+    'RETRY_MAX_DELAY': 3600,
+    'LEASE_TIMEOUT': 900,
+    'POLL_INTERVAL': 5,
+    # Identical payloads queued within this many seconds are dropped
+    'DEDUP_WINDOW': int(os.environ.get('PUSH_DEDUP_WINDOW', 600)),
+    'DEDUP_IGNORE_KEYS': ['created_at'],
+    # Broadcasts of the same data['type'] within WINDOW seconds become one summary push
+    'COALESCE': {
+        'new_devotion': {
+            'WINDOW': int(os.environ.get('PUSH_COALESCE_WINDOW', 120)),
+            'TITLE': 'New Devotions Available',
+            'BODY': '{count} new devotions available',
+        },
+    },
+}
+
+# Scheduled devotion pushes, queued by `python manage.py publish_devotions` (api/devotion_publishing.py)
+DEVOTION_PUBLISHING = {
+    'DELIVERY_TIME': os.environ.get('DEVOTION_DELIVERY_TIME', '06:00'),  # local time per timezone
+    'POLL_INTERVAL': 300,
+}
+
+# Responsive copies of project/event/course/module images (api/image_variants.py)
+IMAGE_VARIANTS = {
+    'WIDTHS': [320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+}
+
+# Testimony video uploads, streamed to storage while the request arrives (api/uploads.py)
+VIDEO_UPLOADS = {
+    'STREAM_TO_STORAGE': True,
+    'MAX_BYTES': int(os.environ.get('VIDEO_UPLOAD_MAX_MB', 1024)) * 1024 * 1024,
+}
+
+# Device token registration (notifications/registration.py)
+DEVICE_REGISTRATION = {
+    'TOUCH_INTERVAL': int(os.environ.get('DEVICE_TOKEN_TOUCH_INTERVAL', 24 * 3600)),  # seconds
+    # Timezone bucket for devices that have not reported one
+    'DEFAULT_TIMEZONE': os.environ.get('DEVICE_DEFAULT_TIMEZONE', 'Africa/Douala'),
+    'FLUSH_SIZE': 500,
+    'FLUSH_INTERVAL': 30,  # seconds
+    'MAX_BATCH_TOKENS': 1000,
+}
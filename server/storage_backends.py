@@ -1,50 +1,676 @@
-from ftplib import FTP
-from django.core.files.storage import Storage
+import atexit
+import logging
 import os
+import posixpath
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from ftplib import FTP, all_errors, error_perm
+from tempfile import SpooledTemporaryFile
+
+from django.core.files import File
+from django.core.files.storage import Storage
 from django.conf import settings
+from django.utils import timezone
+
+from server.media_cache import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FTP_OPTIONS = {
+    "base_path": "/",
+    "port": 21,
+    "passive": True,
+    "timeout": 30,  # seconds, per socket operation
+    "pool_size": 4,  # connections kept per process
+    "stream_pool_size": 4,  # further connections, only for open_upload_stream
+    "keepalive_interval": 30,  # idle seconds before a connection is checked with NOOP
+    "max_idle": 300,  # idle seconds after which a connection is dropped instead
+    "acquire_timeout": 60,  # seconds to wait for a free connection
+    "block_size": 256 * 1024,  # bytes per STOR/APPE write
+    "upload_attempts": 5,  # tries per upload, resuming from the size already on the server
+    "retry_delay": 1,  # seconds before the first resume, doubled for each later one
+    "staged": False,  # write uploads to local disk and ship them with ship_staged_uploads
+    "staging_root": None,  # defaults to MEDIA_ROOT/staged
+    "staged_url": "/staged-media/",  # where server/urls.py serves staged files
+    "metadata_ttl": 60,  # seconds a directory listing answers for the files it lists
+    "spool_max_size": 10 * 1024 * 1024,  # bytes of a downloaded file kept in memory
+    "read_cache_bytes": 0,  # local copies of opened files kept, in bytes; 0 disables
+    "read_cache_root": None,  # defaults to MEDIA_ROOT/cache
+}
+
+
+class FTPConnectionPool:
+    """
+    Thread-safe pool of logged-in FTP connections.
+
+    Connections are handed out most-recently-used first. One that has been
+    idle for ``keepalive_interval`` is checked with ``NOOP`` before reuse, and
+    one idle for longer than ``max_idle`` (past most servers' idle timeout) is
+    replaced. At most ``size`` connections exist at once; callers beyond that
+    wait for one to be released.
+    """
+
+    def __init__(self, connect, size=4, keepalive_interval=30, max_idle=300, acquire_timeout=60):
+        self._connect = connect
+        self.size = max(1, size)
+        self.keepalive_interval = keepalive_interval
+        self.max_idle = max_idle
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()  # (ftp, released_at)
+        self._open = 0
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    ftp, released_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    ftp, released_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No FTP connection free after {self.acquire_timeout}s")
+                self._cond.wait(remaining)
+
+        try:
+            if ftp is not None and not self._is_healthy(ftp, time.monotonic() - released_at):
+                self._close(ftp)
+                ftp = None
+            if ftp is None:
+                ftp = self._connect()
+        except BaseException:
+            self._discard()
+            raise
+        return ftp
+
+    def _is_healthy(self, ftp, idle):
+        if idle > self.max_idle:
+            return False
+        if idle < self.keepalive_interval:
+            return True
+        try:
+            ftp.voidcmd("NOOP")
+            return True
+        except all_errors:
+            return False
+
+    def _release(self, ftp):
+        with self._cond:
+            self._idle.append((ftp, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close(ftp):
+        try:
+            ftp.quit()
+        except all_errors:
+            ftp.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of the block.
+
+        It goes back to the pool unless the block raised a connection-level
+        error, in which case it is closed. Permanent FTP replies (5xx) leave
+        the connection usable.
+        """
+        ftp = self._acquire()
+        try:
+            yield ftp
+        except error_perm:
+            self._release(ftp)
+            raise
+        except BaseException:
+            self._close(ftp)
+            self._discard()
+            raise
+        else:
+            self._release(ftp)
+
+    def close(self):
+        """Log out every idle connection"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for ftp, _released_at in idle:
+            self._close(ftp)
+
 
 class FTPStorage(Storage):
-    def __init__(self):
-        opts = settings.FTP_STORAGE_OPTIONS
+    def __init__(self, **options):
+        opts = {**DEFAULT_FTP_OPTIONS, **settings.FTP_STORAGE_OPTIONS, **options}
         self.host = opts["host"]
         self.username = opts["username"]
         self.password = opts["password"]
-        self.base_path = opts.get("base_path", "/")
-        self.port = opts.get("port", 21)
-        self.passive = opts.get("passive", True)
+        self.base_path = opts["base_path"]
+        self.port = opts["port"]
+        self.passive = opts["passive"]
+        self.timeout = opts["timeout"]
+        self.block_size = opts["block_size"]
+        self.upload_attempts = max(1, opts["upload_attempts"])
+        self.retry_delay = opts["retry_delay"]
+        self.staged = opts["staged"]
+        self.staging_root = str(opts["staging_root"] or os.path.join(settings.MEDIA_ROOT, "staged"))
+        self.staged_url = opts["staged_url"]
+        self.metadata_ttl = opts["metadata_ttl"]
+        self.spool_max_size = opts["spool_max_size"]
+        self.read_cache = None
+        if opts["read_cache_bytes"]:
+            self.read_cache = DiskLRUCache(
+                opts["read_cache_root"] or os.path.join(settings.MEDIA_ROOT, "cache"), opts["read_cache_bytes"]
+            )
+        self.pool = FTPConnectionPool(
+            self._connect,
+            size=opts["pool_size"],
+            keepalive_interval=opts["keepalive_interval"],
+            max_idle=opts["max_idle"],
+            acquire_timeout=opts["acquire_timeout"],
+        )
+        # Streamed uploads last as long as a slow client takes to send the
+        # body; on a pool of their own they never starve saves, reads and
+        # exists() of connections
+        self.stream_pool = FTPConnectionPool(
+            self._connect,
+            size=opts["stream_pool_size"],
+            keepalive_interval=opts["keepalive_interval"],
+            max_idle=opts["max_idle"],
+            acquire_timeout=opts["acquire_timeout"],
+        )
+        atexit.register(self.pool.close)
+        atexit.register(self.stream_pool.close)
+        # Absolute remote directories known to exist; a set add is atomic, so
+        # concurrent uploads at worst both send the same MKD
+        self._known_dirs = {self.base_path.rstrip("/") or "/"}
+        # Remote directory -> (expires_at, {filename: facts}), or None for a
+        # directory that does not exist; filled by whole-directory MLSD
+        self._listings = {}
+        self._listings_lock = threading.Lock()
 
     def _connect(self):
-        ftp = FTP()
+        ftp = FTP(timeout=self.timeout)
         ftp.connect(self.host, self.port)
         ftp.login(self.username, self.password)
         ftp.set_pasv(self.passive)
+        ftp.voidcmd("TYPE I")  # Binary mode, which SIZE needs on most servers
         ftp.cwd(self.base_path)
         return ftp
 
-    def _save(self, name, content):
-        print("Entered here dude")
-        ftp = self._connect()
-        path_parts = name.split("/")
-        for part in path_parts[:-1]:
+    def _run(self, operation):
+        """
+        Call ``operation(ftp)`` with a pooled connection.
+
+        A connection that turns out to be dead (closed by the server, reset,
+        timed out) is replaced and the operation retried once.
+        """
+        for attempt in (1, 2):
             try:
-                ftp.mkd(part)
-            except:
-                pass
-            ftp.cwd(part)
+                with self.pool.connection() as ftp:
+                    return operation(ftp)
+            except error_perm:
+                raise
+            except all_errors as e:
+                if attempt == 2:
+                    raise
+                logger.warning("FTP connection to %s failed (%s); reconnecting", self.host, e)
+
+    def _remote_path(self, name):
+        return posixpath.join(self.base_path, name)
 
+    def _ensure_directories(self, ftp, directory):
+        """
+        Create ``directory`` and its parents unless known to exist.
+
+        Directories are remembered once created (or found to exist), so steady
+        state uploads to ``projects/``, ``events/`` ... send no ``MKD`` at all.
+        """
+        path = self.base_path
+        parts = directory.split("/")
+        for depth, part in enumerate(parts, 1):
+            path = posixpath.join(path, part)
+            if path in self._known_dirs:
+                continue
+            try:
+                ftp.mkd(path)
+            except error_perm:
+                pass  # Already exists; a real permission problem surfaces on STOR
+            self._known_dirs.add(path)
+            self._remember("/".join(parts[:depth]), {"type": "dir"})
+
+    def _forget_directories(self, directory):
+        path = self._remote_path(directory)
+        stale = [known for known in set(self._known_dirs) if known == path or path.startswith(known + "/")]
+        self._known_dirs.difference_update(stale)
+
+    def _upload(self, name, content, progress=None):
+        """
+        Send ``content`` to ``name`` in ``block_size`` writes.
+
+        If the transfer breaks, the next attempt asks the server how much
+        arrived (``SIZE``) and appends the rest from there (``APPE``), up to
+        ``upload_attempts`` tries in all. The upload only counts once ``SIZE``
+        matches the local size. ``progress(sent, total)`` is called after
+        every block.
+        """
+        directory = posixpath.dirname(name)
+        remote = self._remote_path(name)
         content.open()
-        ftp.storbinary(f"STOR {path_parts[-1]}", content.file)
-        ftp.quit()
+        total = content.size
+        delay = self.retry_delay
+        offset = 0
+        retried_directories = False
+
+        for attempt in range(1, self.upload_attempts + 1):
+            try:
+                with self.pool.connection() as ftp:
+                    if directory:
+                        self._ensure_directories(ftp, directory)
+                    if attempt > 1:
+                        ftp.voidcmd("TYPE I")  # SIZE needs binary mode, and MLSD leaves ASCII set
+                        offset = self._remote_size(ftp, remote)
+                        if offset is None or offset > total:
+                            offset = 0
+
+                    sent = offset
+
+                    def block_sent(block):
+                        nonlocal sent
+                        sent += len(block)
+                        if progress:
+                            progress(sent, total)
+
+                    content.seek(offset)
+                    command = f"APPE {remote}" if offset else f"STOR {remote}"
+                    ftp.storbinary(command, content.file, self.block_size, block_sent)
+                    stored = self._remote_size(ftp, remote)
+                if stored == total:
+                    self._remember(name, {"type": "file", "size": total, "modify": datetime.now(dt_timezone.utc)})
+                    return
+                # Not a connection error, but the next attempt resumes it just the same
+                logger.warning("FTP upload of %s stored %s of %s bytes", name, stored, total)
+            except error_perm:
+                if not directory or retried_directories:
+                    raise
+                # The cache may be stale if a directory was removed on the server
+                logger.info("STOR of %s refused; re-creating its directories", name)
+                self._forget_directories(directory)
+                retried_directories = True
+                continue
+            except all_errors as e:
+                if attempt == self.upload_attempts:
+                    raise
+                logger.warning("FTP upload of %s broke off (%s); resuming (attempt %s of %s)",
+                               name, e, attempt + 1, self.upload_attempts)
+            if attempt < self.upload_attempts:
+                time.sleep(delay)
+                delay *= 2
+        raise OSError(f"FTP upload of {name} incomplete after {self.upload_attempts} attempts")
+
+    @staticmethod
+    def _remote_size(ftp, remote):
+        try:
+            return ftp.size(remote)
+        except error_perm:
+            return None
+
+    def _save(self, name, content):
+        if self.staged:
+            self._stage(name, content)
+        else:
+            self._upload(name, content)
         return name
 
-    def exists(self, name):
+    def open_upload_stream(self, name):
+        """
+        Start a new file that is written one chunk at a time.
+
+        Used by api/uploads.py to pass request bodies through as they
+        arrive. The stream has ``write(data)``, ``close()``, which returns the
+        stored name, and ``abort()``. It writes to the FTP host directly, or
+        to the staging directory in staged mode.
+        """
+        name = self.get_available_name(name)
+        if self.staged:
+            return _StagedUploadStream(self, name)
+        return _FTPUploadStream(self, name)
+
+    # Staged uploads: the request only writes to local disk, and
+    # ship_staged_uploads moves the file to the FTP host afterwards. A staged
+    # file is pending for as long as its local copy exists.
+
+    def staged_path(self, name):
+        return os.path.join(self.staging_root, *name.split("/"))
+
+    def is_pending(self, name):
+        return os.path.exists(self.staged_path(name))
+
+    def _stage(self, name, content):
+        path = self.staged_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write under a temporary name so the shipper never sees half a file
+        partial = f"{path}.partial"
+        content.open()
+        content.seek(0)
+        with open(partial, "wb") as f:
+            for chunk in content.chunks():
+                f.write(chunk)
+        os.replace(partial, path)
+
+    def pending_names(self):
+        """Names of the staged files still waiting to be shipped, oldest first"""
+        found = []
+        for directory, _dirs, files in os.walk(self.staging_root):
+            for filename in files:
+                if filename.endswith(".partial"):
+                    continue
+                path = os.path.join(directory, filename)
+                found.append((os.path.getmtime(path), os.path.relpath(path, self.staging_root)))
+        return [name.replace(os.sep, "/") for _mtime, name in sorted(found)]
+
+    def ship(self, name, progress=None):
+        """Upload one staged file to the FTP host and remove the local copy"""
+        path = self.staged_path(name)
+        with File(open(path, "rb")) as content:
+            self._upload(name, content, progress)
+        os.remove(path)
+        # Prune directories emptied by the shipment, up to the staging root
+        directory = os.path.dirname(path)
+        while directory != self.staging_root:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    # Metadata: answered from a per-directory MLSD listing kept for
+    # metadata_ttl seconds and updated in place by this process's own saves
+    # and deletes, so bursts of exists/size calls on files that are there
+    # (admin pages, serializers) cost at most one round trip per directory.
+    # A name missing from the listing is always checked on the server, since
+    # another process may have stored it since; get_available_name must never
+    # hand out a name that is taken.
+
+    def _listing(self, directory):
+        remote = self._remote_path(directory).rstrip("/") or "/"
+        with self._listings_lock:
+            cached = self._listings.get(remote)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        def mlsd(ftp):
+            try:
+                return {
+                    filename: self._parse_facts(facts)
+                    for filename, facts in ftp.mlsd(remote, facts=["type", "size", "modify"])
+                    if facts.get("type") not in ("cdir", "pdir")
+                }
+            except error_perm:
+                return None  # No such directory
+
+        entries = self._run(mlsd)
+        if entries is not None:
+            self._known_dirs.add(remote)
+        with self._listings_lock:
+            self._listings[remote] = (time.monotonic() + self.metadata_ttl, entries)
+        return entries
+
+    @staticmethod
+    def _parse_facts(facts):
+        parsed = {"type": facts.get("type", "file")}
+        if "size" in facts:
+            parsed["size"] = int(facts["size"])
+        if "modify" in facts:
+            # YYYYMMDDHHMMSS[.sss] in UTC (RFC 3659)
+            parsed["modify"] = datetime.strptime(facts["modify"][:14], "%Y%m%d%H%M%S").replace(tzinfo=dt_timezone.utc)
+        return parsed
+
+    def _entry(self, name):
+        name = name.rstrip("/")
+        directory, filename = posixpath.split(name)
+        entries = self._listing(directory)
+        entry = entries.get(filename) if entries else None
+        if entry is None:
+            entry = self._run(lambda ftp: self._stat(ftp, name))
+            if entry is not None:
+                self._remember(name, entry)
+        return entry
+
+    def _stat(self, ftp, name):
+        """Facts for ``name`` straight from the server (``MLST``, else ``SIZE``), or None if it does not exist"""
+        remote = self._remote_path(name)
         try:
-            ftp = self._connect()
-            ftp.size(name)
-            ftp.quit()
+            response = ftp.sendcmd(f"MLST {remote}")
+        except error_perm as e:
+            if not str(e).startswith(("500", "502", "504")):
+                return None  # 550: no such file or directory
+            # No MLST on this server; SIZE at least finds files
+            ftp.voidcmd("TYPE I")
+            size = self._remote_size(ftp, remote)
+            return None if size is None else {"type": "file", "size": size}
+        # 250-Listing <path>\r\n <fact>=<value>;...; <path>\r\n250 End
+        for line in response.splitlines()[1:]:
+            if line.startswith(" "):
+                facts = {}
+                for fact in line.strip().split(" ", 1)[0].split(";"):
+                    key, _sep, value = fact.partition("=")
+                    if value:
+                        facts[key.lower()] = value
+                return self._parse_facts(facts)
+        return None
+
+    def _remember(self, name, facts):
+        directory, filename = posixpath.split(name)
+        remote = self._remote_path(directory).rstrip("/") or "/"
+        with self._listings_lock:
+            cached = self._listings.get(remote)
+            if cached is None:
+                return
+            entries = dict(cached[1] or {})
+            if facts is None:
+                entries.pop(filename, None)
+            else:
+                entries[filename] = facts
+            self._listings[remote] = (cached[0], entries)
+
+    def clear_metadata_cache(self):
+        with self._listings_lock:
+            self._listings.clear()
+
+    def exists(self, name):
+        if self.is_pending(name):
             return True
-        except:
+        try:
+            return self._entry(name) is not None
+        except all_errors:
+            logger.exception("Error checking whether %s exists on FTP", name)
             return False
 
+    def size(self, name):
+        if self.is_pending(name):
+            return os.path.getsize(self.staged_path(name))
+        entry = self._entry(name)
+        if entry is None or "size" not in entry:
+            raise FileNotFoundError(name)
+        return entry["size"]
+
+    def get_modified_time(self, name):
+        if self.is_pending(name):
+            modified = datetime.fromtimestamp(os.path.getmtime(self.staged_path(name)), dt_timezone.utc)
+        else:
+            entry = self._entry(name)
+            if entry is None or "modify" not in entry:
+                raise FileNotFoundError(name)
+            modified = entry["modify"]
+        return modified if settings.USE_TZ else timezone.make_naive(modified)
+
+    def listdir(self, path):
+        entries = self._listing(path.strip("/"))
+        if entries is None:
+            raise FileNotFoundError(path)
+        directories = [filename for filename, facts in entries.items() if facts["type"] == "dir"]
+        files = [filename for filename, facts in entries.items() if facts["type"] != "dir"]
+        return directories, files
+
+    def _open(self, name, mode="rb"):
+        if "w" in mode or "a" in mode or "+" in mode:
+            raise ValueError("FTPStorage only opens files for reading; use save()")
+        if self.is_pending(name):
+            return File(open(self.staged_path(name), mode), name=name)
+        if self.read_cache is not None:
+            return self._open_cached(name, mode)
+
+        spool = SpooledTemporaryFile(max_size=self.spool_max_size)
+        self._download(name, spool)
+        spool.seek(0)
+        return File(spool, name=name)
+
+    def _download(self, name, f):
+        def retrieve(ftp):
+            f.seek(0)
+            f.truncate()
+            ftp.retrbinary(f"RETR {self._remote_path(name)}", f.write, self.block_size)
+
+        try:
+            self._run(retrieve)
+        except error_perm:
+            raise FileNotFoundError(name)
+
+    def _open_cached(self, name, mode):
+        """Serve ``name`` from the local read cache, downloading it on a miss"""
+        entry = self._entry(name)
+        if entry is None or "size" not in entry or "modify" not in entry:
+            raise FileNotFoundError(name)
+        modified = entry["modify"].timestamp()
+        path = self.read_cache.get(name, entry["size"], modified)
+        if path is None:
+            path = self.read_cache.put(name, modified, lambda f: self._download(name, f))
+        try:
+            return File(open(path, mode), name=name)
+        except FileNotFoundError:
+            # Evicted between filling and opening, by this or another process
+            spool = SpooledTemporaryFile(max_size=self.spool_max_size)
+            self._download(name, spool)
+            spool.seek(0)
+            return File(spool, name=name)
+
+    def delete(self, name):
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        if self.is_pending(name):
+            os.remove(self.staged_path(name))
+
+        def remove(ftp):
+            try:
+                ftp.delete(self._remote_path(name))
+            except error_perm:
+                pass  # Already gone, which is what the caller wanted
+
+        self._run(remove)
+        self._remember(name, None)
+        if self.read_cache is not None:
+            self.read_cache.discard(name)
+
     def url(self, name):
-        return f"{settings.MEDIA_URL}{name}"
\ No newline at end of file
+        if self.staged and self.is_pending(name):
+            return f"{self.staged_url}{name}"
+        return f"{settings.MEDIA_URL}{name}"
+
+
+class _StagedUploadStream:
+    def __init__(self, storage, name):
+        self.name = name
+        self.size = 0
+        self._path = storage.staged_path(name)
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        self._partial = f"{self._path}.partial"
+        self._file = open(self._partial, "wb")
+
+    def write(self, data):
+        self._file.write(data)
+        self.size += len(data)
+
+    def close(self):
+        self._file.close()
+        os.replace(self._partial, self._path)
+        return self.name
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._partial)
+
+
+class _FTPUploadStream:
+    """A ``STOR`` on a connection from the stream pool, held for as long as the upload lasts"""
+
+    def __init__(self, storage, name):
+        self.name = name
+        self.size = 0
+        self._storage = storage
+        self._remote = storage._remote_path(name)
+        self._connection = storage.stream_pool.connection()
+        self._ftp = self._connection.__enter__()
+        try:
+            directory = posixpath.dirname(name)
+            if directory:
+                storage._ensure_directories(self._ftp, directory)
+            self._ftp.voidcmd("TYPE I")
+            self._data = self._ftp.transfercmd(f"STOR {self._remote}")
+        except BaseException as e:
+            self._release(e)
+            raise
+
+    def _release(self, error=None):
+        # Hands the connection back to the pool, or closes it after an error
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        if error is None:
+            connection.__exit__(None, None, None)
+        else:
+            connection.__exit__(type(error), error, error.__traceback__)
+
+    def write(self, data):
+        try:
+            self._data.sendall(data)
+        except BaseException as e:
+            self._data.close()
+            self._release(e)
+            raise
+        self.size += len(data)
+
+    def close(self):
+        try:
+            self._data.close()
+            self._ftp.voidresp()
+            stored = self._storage._remote_size(self._ftp, self._remote)
+        except BaseException as e:
+            self._release(e)
+            raise
+        self._release()
+        if stored != self.size:
+            raise OSError(f"FTP stored {stored} of {self.size} bytes for {self.name}")
+        self._storage._remember(self.name, {"type": "file", "size": stored, "modify": datetime.now(dt_timezone.utc)})
+        return self.name
+
+    def abort(self):
+        if self._connection is not None:
+            self._data.close()
+            # The server may still be finishing the STOR, so the connection is not reused
+            self._release(ConnectionAbortedError("upload aborted"))
+        try:
+            self._storage.delete(self.name)
+        except all_errors:
+            logger.warning("Could not remove the partial upload %s", self.name, exc_info=True)
+
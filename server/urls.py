@@ -1,8 +1,10 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponseRedirect, JsonResponse
+from django.views.static import serve
 
 def list_routes(request):
     """Debug view to list all available URLs"""
@@ -24,9 +26,20 @@ def list_routes(request):
     list_urls(resolver.url_patterns)
     return JsonResponse({'urls': urls})
 
+def staged_media(request, path):
+    """Serve an upload still waiting to be shipped to FTP, or redirect once it has been"""
+    staging_root = getattr(default_storage, 'staging_root', None)
+    if staging_root is None:
+        raise Http404
+    try:
+        return serve(request, path, document_root=staging_root)
+    except Http404:
+        return HttpResponseRedirect(f"{settings.MEDIA_URL}{path}")
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('api/notifications/', include('notifications.urls')),
     path('__debug__/urls/', list_routes),  # Debug URL
+    re_path(r'^staged-media/(?P<path>.*)$', staged_media, name='staged-media'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file